@@ -0,0 +1,100 @@
+import argparse
+import numpy as np
+from time import perf_counter
+from builder import settings
+from builder.implementations import parse_example
+from builder.scheduler import heuristic_cost
+from builder.snapshot import load_categoriser
+from builder.verification import allclose_maybe_permuted, run_tabulation
+
+parser = argparse.ArgumentParser(
+    description="Time the comparison of verification tables on tables tabulated by symfem.")
+parser.add_argument('--test', metavar="test", default=None,
+                    help="Only use examples of these elements.")
+parser.add_argument('--examples', metavar="examples", default="10",
+                    help="The number of examples to use. The largest examples are used.")
+parser.add_argument('--timeout', metavar="timeout", default="600",
+                    help="The number of seconds each tabulation can take before it is skipped.")
+parser.add_argument('--repeats', metavar="repeats", default="5",
+                    help="The number of times each comparison is timed.")
+parser.add_argument('--compare-old', action="store_true",
+                    help="Also time the loop that was used before the comparison was vectorised.")
+
+args = parser.parse_args()
+settings.verification_timeout = float(args.timeout)
+test_elements = None if args.test is None else args.test.split(",")
+
+
+def old_allclose_maybe_permuted(table0, table1):
+    # The comparison used by verify.py before the tables were compared with vectorised
+    # operations. Kept here as a reference point for the timings
+    table0 = table0.reshape(-1, table0.shape[-1])
+    table1 = table1.reshape(-1, table1.shape[-1])
+    remaining = [i for i, _ in enumerate(table1.T)]
+    for t0 in table0.T:
+        for i in remaining:
+            if np.allclose(t0, table1.T[i]):
+                remaining.remove(i)
+                break
+        else:
+            return False
+    return True
+
+
+def best_time(f, *tables):
+    times = []
+    for _ in range(int(args.repeats)):
+        start = perf_counter()
+        f(*tables)
+        times.append(perf_counter() - start)
+    return min(times)
+
+
+def size(e, example):
+    # The number of DOFs given by the element's ndofs formula, if it has one, so that the
+    # examples with the largest tables are used first
+    cell, order = parse_example(example)[:2]
+    counts = e.dof_count_tables([int(order)]).get("ndofs", {})
+    ndofs = counts[cell].get(int(order), 0) if counts.get(cell) is not None else 0
+    return ndofs, heuristic_cost(cell, int(order))
+
+
+categoriser = load_categoriser(timestamps=False)
+examples = [
+    (e.filename, eg) for e in categoriser.elements
+    if (test_elements is None or e.filename in test_elements) and e.implemented("symfem")
+    for eg in e.examples]
+examples.sort(key=lambda i: size(categoriser.get_element_by_filename(i[0]), i[1]), reverse=True)
+
+functions = {"new": allclose_maybe_permuted}
+if args.compare_old:
+    functions["old"] = old_allclose_maybe_permuted
+
+header = f"{'example':<50} {'dofs':>5}"
+for case in ["same", "permuted", "mismatch"]:
+    for name in functions:
+        header += f" {case + ' ' + name:>14}"
+print(header)
+
+rng = np.random.default_rng(0)
+done = 0
+for fname, eg in examples:
+    if done >= int(args.examples):
+        break
+    try:
+        table = np.asarray(run_tabulation("symfem", fname, eg), dtype=float)
+    except (TimeoutError, MemoryError, NotImplementedError, ValueError):
+        print(f"{fname} {eg}: skipped, could not be tabulated")
+        continue
+    done += 1
+
+    # The same table with its basis functions in a random order, and with one basis function
+    # changed so that there is no matching permutation
+    permuted = table[..., rng.permutation(table.shape[-1])]
+    mismatch = permuted.copy()
+    mismatch[..., -1] += 1
+    line = f"{fname + ' ' + eg:<50} {table.shape[-1]:>5}"
+    for other in [table, permuted, mismatch]:
+        for f in functions.values():
+            line += f" {1000 * best_time(f, table, other):>12.1f}ms"
+    print(line)
@@ -1,19 +1,27 @@
 import json
 import os
+import re
 import argparse
 import symfem
 from datetime import datetime
-from symfem import create_element
-from builder import plotting, settings
+from builder import plotting, profiling, settings
 from builder.markup import markup, insert_links, python_highlight, cap_first, heading_with_self_ref
 from builder.examples import markup_example
 from builder.citations import markup_citation, make_bibtex
-from builder.element import Categoriser
-from builder.html import make_html_page
+from builder.contributors import get_contributors
+from builder.export import write_export
+from builder.html import make_html_page, write_html_file
 from builder.implementations import parse_example, verifications
 from builder.tools import parse_metadata, insert_author_info, html_local
 from builder.families import keys_and_names
+from builder.manifest import Manifest, hash_data, hash_files
+from builder.pagebuilder import PageBuilder
 from builder.rss import make_rss
+from builder.scheduler import heuristic_cost, run_tasks
+from builder.schema import check_catalogue
+from builder.snapshot import load_categoriser
+from builder.symfem_cache import create_element
+from builder.verification import badge_status, verification_status
 
 start_all = datetime.now()
 
@@ -24,20 +32,51 @@ parser.add_argument('--test', metavar="test", default=None,
                     help="Builds a version of the website with fewer elements.")
 parser.add_argument('--github-token', metavar="github_token", default=None,
                     help="Provide a GitHub token to get update timestamps.")
+parser.add_argument('--contributors-source', metavar="contributors_source", default=None,
+                    help="Where to get the list of contributors from: github, git, or a JSON file.")
 parser.add_argument('--processes', metavar="processes", default=None,
                     help="The number of processes to run the building of examples on.")
+parser.add_argument('--raster-processes', metavar="raster_processes", default=None,
+                    help="The number of processes used by each process to convert plots to PNG.")
+parser.add_argument('--load-processes', metavar="load_processes", default=None,
+                    help="The number of processes used to parse changed .def files.")
+parser.add_argument('--profile', action="store_true",
+                    help="Write a report of the time taken by each phase of the build.")
+parser.add_argument('--profile-html', action="store_true",
+                    help="Write the report of the time taken by the build as an HTML page.")
+parser.add_argument('--cprofile', metavar="cprofile", default=None,
+                    help="Comma separated list of build phases to run with cProfile.")
 parser.add_argument('--verification-json', metavar="verification_json", default=None,
                     help="Provide a verification JSON.")
+parser.add_argument('--incremental', action="store_true",
+                    help="Only rebuild pages whose inputs have changed since the last build.")
+parser.add_argument('--no-cache', action="store_true",
+                    help="Do not use the on-disk cache of symfem elements.")
 
 sitemap = {}
 
 
-def write_html_page(path, title, content):
-    global sitemap
+def register_html_page(path, title, inputs):
     assert html_local(path) not in sitemap
     sitemap[html_local(path)] = title
+    manifest.record(html_local(path), inputs, title=title)
+
+
+def write_html_page(path, title, content, inputs=None):
+    page = make_html_page(content, title)
+    if inputs is None:
+        inputs = hash_data(page)
+    if os.path.isfile(path) and manifest.up_to_date(html_local(path), inputs):
+        reuse_html_page(path)
+        return
+    register_html_page(path, title, inputs)
     with open(path, "w") as f:
-        f.write(make_html_page(content, title))
+        f.write(page)
+
+
+def reuse_html_page(path):
+    assert html_local(path) not in sitemap
+    sitemap[html_local(path)] = manifest.reuse(html_local(path))["title"]
 
 
 args = parser.parse_args()
@@ -51,12 +90,30 @@ if args.destination is not None:
 if args.processes is not None:
     settings.processes = int(args.processes)
 
+if args.raster_processes is not None:
+    settings.raster_processes = int(args.raster_processes)
+
 if args.github_token is not None:
     settings.github_token = args.github_token
 
+if args.contributors_source is not None:
+    settings.contributors_source = args.contributors_source
+
+if args.load_processes is not None:
+    settings.load_processes = int(args.load_processes)
+if args.no_cache:
+    settings.use_cache = False
+
 if args.verification_json is not None:
     settings.verification_json = args.verification_json
 
+if args.profile or args.profile_html:
+    settings.profile = True
+    settings.profile_html = args.profile_html
+
+if args.cprofile is not None:
+    settings.cprofile_phases = args.cprofile.split(",")
+
 if args.test is None:
     test_elements = None
 elif args.test == "auto":
@@ -67,19 +124,30 @@ elif args.test == "auto":
 else:
     test_elements = args.test.split(",")
 
+# Check the element definitions before anything is built, so that mistakes in them are found
+# before the output folder is cleared
+profiling.start_phase("validation")
+check_catalogue()
+
+# Load the manifest of the previous build. If the shared inputs (templates, data, builder
+# sources, symfem version) have changed, the manifest is empty and everything is rebuilt
+manifest = Manifest(os.path.join(settings.html_path, ".manifest.json"), args.incremental)
+settings.incremental = not manifest.is_empty
+
 # Prepare paths
-if os.path.isdir(settings.html_path):
+if os.path.isdir(settings.html_path) and not settings.incremental:
     os.system(f"rm -rf {settings.html_path}")
-os.mkdir(settings.html_path)
-os.mkdir(settings.htmlelement_path)
-os.mkdir(settings.htmlindices_path)
-os.mkdir(settings.htmlfamilies_path)
-os.mkdir(settings.htmlimg_path)
-os.mkdir(os.path.join(settings.html_path, "badges"))
+for path in [
+    settings.html_path, settings.htmlelement_path, settings.htmlindices_path,
+    settings.htmlfamilies_path, settings.htmlimg_path, os.path.join(settings.html_path, "badges"),
+    os.path.join(settings.htmlelement_path, "bibtex"),
+    os.path.join(settings.htmlelement_path, "examples"),
+]:
+    os.makedirs(path, exist_ok=True)
+
+plotting.reset_plot_store()
 
 os.system(f"cp -r {settings.dir_path}/people {settings.htmlimg_path}")
-os.mkdir(os.path.join(settings.htmlelement_path, "bibtex"))
-os.mkdir(os.path.join(settings.htmlelement_path, "examples"))
 
 os.system(f"cp -r {settings.files_path}/* {settings.html_path}")
 
@@ -87,33 +155,43 @@ with open(os.path.join(settings.html_path, "CNAME"), "w") as f:
     f.write("defelement.com")
 
 # Make pages
+profiling.start_phase("markdown pages")
 for file in os.listdir(settings.pages_path):
     if file.endswith(".md"):
         start = datetime.now()
         fname = file[:-3]
-        print(f"{fname}.html", end="", flush=True)
+        page_path = os.path.join(settings.html_path, f"{fname}.html")
         with open(os.path.join(settings.pages_path, file)) as f:
-            metadata, content = parse_metadata(f.read())
+            page_content = f.read()
+        metadata, content = parse_metadata(page_content)
+        # Pages with citation info show the date that they were built
+        has_dates = "{{date:" in page_content or "authors" in metadata
+        # Images drawn from .img files are plotted when the page is made
+        img_files = [os.path.join(settings.img_path, f"{i}.img")
+                     for i in re.findall(r"{{img::([^}]+)}}", page_content)]
+        page_inputs = hash_data([
+            page_content,
+            get_contributors() if "{{list contributors" in page_content else None,
+            datetime.now().strftime("%d-%B-%Y") if has_dates else None,
+            hash_files(img_files)])
+        if os.path.isfile(page_path) and manifest.up_to_date(html_local(page_path), page_inputs):
+            reuse_html_page(page_path)
+            continue
+        print(f"{fname}.html", end="", flush=True)
 
         if "authors" in metadata:
             content = insert_author_info(content, metadata["authors"], f"{fname}.html")
 
         content = markup(content)
 
-        write_html_page(os.path.join(settings.html_path, f"{fname}.html"),
-                        metadata["title"], content)
+        write_html_page(page_path, metadata["title"], content, page_inputs)
         end = datetime.now()
         print(f" (completed in {(end - start).total_seconds():.2f}s)")
 
 # Load categories and reference elements
-categoriser = Categoriser()
-categoriser.load_categories(os.path.join(settings.data_path, "categories"))
-categoriser.load_references(os.path.join(settings.data_path, "references"))
-categoriser.load_families(os.path.join(settings.data_path, "families"))
-categoriser.load_implementations(os.path.join(settings.data_path, "implementations"))
-
+profiling.start_phase("categoriser")
 # Load elements from .def files
-categoriser.load_folder(settings.element_path)
+categoriser = load_categoriser()
 
 cdescs = {
     "L2": "Discontinuous.",
@@ -142,10 +220,56 @@ blue_minus = ("<i class='fa-solid fa-square-minus' style='color:"
               f"{symfem.plotting.Colors.BLUE};{icon_style}'></i>")
 
 # Generate element pages
-all_examples = []
-for e in categoriser.elements:
-    print(e.name)
-    content = heading_with_self_ref("h1", cap_first(e.html_name))
+profiling.start_phase("element pages")
+catalogue_names = [(e.filename, e.html_name) for e in categoriser.elements]
+
+
+def make_element_page(e, process=""):
+    # This function runs in the worker processes, so returns the information that the main
+    # process needs to add the page to the sitemap and manifest instead of adding it directly
+    print(f"{process}{e.name}", flush=True)
+
+    # Collect examples using symfem
+    element_examples = []
+    if e.has_examples and (test_elements is None or e.filename in test_elements):
+        assert e.implemented("symfem")
+
+        for eg in e.examples:
+            cell, order, variant, kwargs = parse_example(eg)
+            symfem_name, params = e.get_implementation_string("symfem", cell, variant)
+
+            fname = f"{cell}-{e.filename}"
+            if variant is not None:
+                fname += f"-{variant}"
+            fname += f"-{order}.html"
+            for s in " ()":
+                fname = fname.replace(s, "-")
+
+            name = f"{cell}<br />order {order}"
+            if variant is not None:
+                name += f"<br />{e.variant_name(variant)} variant"
+            for i, j in kwargs.items():
+                name += f"<br />{i}={str(j).replace(' ', '&nbsp;')}"
+
+            eginfo = {
+                "name": name, "args": [cell, symfem_name, order], "kwargs": kwargs,
+                "html_name": e.html_name, "element_filename": e.html_filename,
+                "filename": fname, "url": f"/elements/examples/{fname}"}
+            if "variant" in params:
+                eginfo["kwargs"]["variant"] = params["variant"]
+            element_examples.append(eginfo)
+
+    element_path = os.path.join(settings.htmlelement_path, e.html_filename)
+    element_inputs = hash_data([
+        hash_files([os.path.join(settings.element_path, f"{e.filename}.def")]),
+        verification.get(e.filename), e.created, e.modified, element_examples, catalogue_names])
+    if os.path.isfile(element_path) and manifest.up_to_date(
+        html_local(element_path), element_inputs
+    ):
+        return element_examples, None
+
+    content = PageBuilder()
+    content.heading("h1", cap_first(e.html_name))
     element_data = []
     implementations = []
 
@@ -239,25 +363,20 @@ for e in categoriser.elements:
 
             if e.has_implementation_examples(codename):
                 jscodename = codename.replace('.', '_').replace('-', '_')
-                info += (
-                    "<br />"
-                    f"<a class='show_eg_link' id='show_{jscodename}_link' "
-                    f"href='javascript:show_{jscodename}_eg()' style='display:block'>"
-                    f"&darr; Show {libname} examples &darr;</a>"
-                    f"<a class='hide_eg_link' id='hide_{jscodename}_link' "
-                    f"href='javascript:hide_{jscodename}_eg()' style='display:none'>"
-                    f"&uarr; Hide {libname} examples &uarr;</a>"
-                    f"<div id='{jscodename}_eg' style='display:none'>"
+                example = PageBuilder(
                     f"Before trying this example, you must install <a href='{url}'>{libname}</a>")
                 if pip is None:
-                    info += ". "
+                    example += ". "
                 else:
-                    info += f":<p class='pcode'>{pip}</p>"
-                info += "This element can then be created with the following lines of Python:"
-
-                info += "<p class='pcode'>" + python_highlight(
-                    e.make_implementation_examples(codename)) + "</p>"
-                info += "</div>"
+                    example += f":<p class='pcode'>{pip}</p>"
+                example += "This element can then be created with the following lines of Python:"
+                example.add("<p class='pcode'>", python_highlight(
+                    e.make_implementation_examples(codename)), "</p>")
+
+                info = PageBuilder(info)
+                info += "<br />"
+                info.show_hide(f"{jscodename}_eg", f"Show {libname} examples",
+                               f"Hide {libname} examples", example, link_class="eg_link")
                 if codename == "symfem":
                     info += (
                         f"{green_check} <span style='{text_style}'>"
@@ -265,8 +384,16 @@ for e in categoriser.elements:
                         "verify other implementations.</span>")
                 if e.filename in verification and codename in verification[e.filename]:
                     v = verification[e.filename][codename]
-                    if len(v["fail"]) == 0:
-                        if len(v["not implemented"]) == 0:
+                    status = verification_status(v)
+                    not_verified = ""
+                    for key, label in [("not implemented", "Not implemented"),
+                                       ("timed out", "Timed out")]:
+                        if key in v and len(v[key]) > 0:
+                            not_verified += (
+                                f"<div style='margin-left:70px;text-indent:-40px;{text_style}'>"
+                                f"{blue_minus} <b>{label}</b>: {'; '.join(v[key])}</div>")
+                    if status == "pass":
+                        if not_verified == "":
                             info += (
                                 f"{green_check} <span style='{text_style}'>"
                                 "This implementation is correct for all the examples below."
@@ -288,9 +415,7 @@ for e in categoriser.elements:
                                 f"<div style='margin-left:70px;text-indent:-40px;{text_style}'>"
                                 f"{green_check} "
                                 f"<b>Correct</b>: {'; '.join(v['pass'])}</div>"
-                                f"<div style='margin-left:70px;text-indent:-40px;{text_style}'>"
-                                f"{blue_minus} "
-                                f"<b>Not implemented</b>: {'; '.join(v['not implemented'])}</div>"
+                                f"{not_verified}"
                                 "</div>"
                                 "</div>"
                                 "<script type='text/javascript'>\n"
@@ -306,7 +431,7 @@ for e in categoriser.elements:
                                 ".style.display = 'block'\n"
                                 f"document.getElementById('{jscodename}-hiddenverification')"
                                 ".style.display = 'none'\n}\n</script>")
-                    elif len(v["pass"]) > 0:
+                    elif status == "partial":
                         info += (
                             f"{orange_check} <span style='{text_style}'>"
                             "This implementation is correct for some of "
@@ -321,16 +446,14 @@ for e in categoriser.elements:
                             "&uarr; Hide &uarr;</a></div>"
                             f"<div style='margin-left:70px;text-indent:-40px;{text_style}'>"
                             f"{green_check} "
-                            f"<b>Correct</b>: {'; '.join(v['pass'])}</div>"
-                            f"<div style='margin-left:70px;text-indent:-40px;{text_style}'>"
-                            f"{red_check} "
-                            f"<b>Incorrect</b>: {'; '.join(v['fail'])}</div>")
-                        if len(v["not implemented"]) > 0:
+                            f"<b>Correct</b>: {'; '.join(v['pass'])}</div>")
+                        if len(v["fail"]) > 0:
                             info += (
                                 f"<div style='margin-left:70px;text-indent:-40px;{text_style}'>"
-                                f"{blue_minus} "
-                                f"<b>Not implemented</b>: {'; '.join(v['not implemented'])}</div>"
-                                "</div>")
+                                f"{red_check} "
+                                f"<b>Incorrect</b>: {'; '.join(v['fail'])}</div>")
+                        if not_verified != "":
+                            info += not_verified + "</div>"
                         info += (
                             "</div>"
                             "<script type='text/javascript'>\n"
@@ -346,26 +469,18 @@ for e in categoriser.elements:
                             ".style.display = 'block'\n"
                             f"document.getElementById('{jscodename}-hiddenverification')"
                             ".style.display = 'none'\n}\n</script>")
+                    elif status == "unverified":
+                        info += (
+                            f"{blue_minus} <span style='{text_style}'>"
+                            "This implementation could not be verified for any of the examples "
+                            f"below.</span>{not_verified}")
                     else:
                         info += (
                             f"{red_check} "
                             "This implementation is incorrect for this element.</span>")
-                info += (
-                    "<script type='text/javascript'>\n"
-                    f"function show_{jscodename}_eg(){{\n"
-                    f" document.getElementById('show_{jscodename}_link').style.display='none'\n"
-                    f" document.getElementById('hide_{jscodename}_link').style.display='block'\n"
-                    f" document.getElementById('{jscodename}_eg').style.display='block'\n"
-                    "}\n"
-                    f"function hide_{jscodename}_eg(){{\n"
-                    f" document.getElementById('show_{jscodename}_link').style.display='block'\n"
-                    f" document.getElementById('hide_{jscodename}_link').style.display='none'\n"
-                    f" document.getElementById('{jscodename}_eg').style.display='none'\n"
-                    "}\n"
-                    "</script>")
 
             implementations.append(
-                (f"<a href='/lists/implementations/{libname}.html'>{libname}</a>", info))
+                (f"<a href='/lists/implementations/{libname}.html'>{libname}</a>", str(info)))
 
     # Categories
     cats = e.categories()
@@ -373,68 +488,31 @@ for e in categoriser.elements:
         element_data.append(("Categories", ", ".join(cats)))
 
     # Write element data
-    content += "<table class='element-info'>"
-    for i, j in element_data:
-        content += f"<tr><td>{i.replace(' ', '&nbsp;').replace('<breakable>', ' ')}</td>"
-        content += f"<td>{j}</td></tr>"
-    content += "</table>"
+    content.table([(i.replace(' ', '&nbsp;').replace('<breakable>', ' '), j)
+                   for i, j in element_data])
 
     # Write implementations
     if len(implementations) > 0:
-        content += heading_with_self_ref("h2", "Implementations")
-        content += "<table class='element-info'>"
-        for i, j in implementations:
-            content += f"<tr><td>{i.replace(' ', '&nbsp;')}</td><td>{j}</td></tr>"
-        content += "</table>"
+        content.heading("h2", "Implementations")
+        content.table([(i.replace(' ', '&nbsp;'), j) for i, j in implementations])
 
     # Write examples using symfem
-    if e.has_examples:
-        element_examples = []
-
-        if test_elements is None or e.filename in test_elements:
-            assert e.implemented("symfem")
-
-            for eg in e.examples:
-                cell, order, variant, kwargs = parse_example(eg)
-                symfem_name, params = e.get_implementation_string("symfem", cell, variant)
-
-                fname = f"{cell}-{e.filename}"
-                if variant is not None:
-                    fname += f"-{variant}"
-                fname += f"-{order}.html"
-                for s in " ()":
-                    fname = fname.replace(s, "-")
-
-                name = f"{cell}<br />order {order}"
-                if variant is not None:
-                    name += f"<br />{e.variant_name(variant)} variant"
-                for i, j in kwargs.items():
-                    name += f"<br />{i}={str(j).replace(' ', '&nbsp;')}"
-
-                eginfo = {
-                    "name": name, "args": [cell, symfem_name, order], "kwargs": kwargs,
-                    "html_name": e.html_name, "element_filename": e.html_filename,
-                    "filename": fname, "url": f"/elements/examples/{fname}"}
-                if "variant" in params:
-                    eginfo["kwargs"]["variant"] = params["variant"]
-                all_examples.append(eginfo)
-                element_examples.append(eginfo)
-
-        if len(element_examples) > 0:
-            content += heading_with_self_ref("h2", "Examples")
-            content += "<table class='element-info'>"
-            for eg in element_examples:
-                element = create_element(*eg['args'], **eg['kwargs'])
-                content += (
-                    f"<tr><td>{eg['name']}</td><td><center><a href='{eg['url']}'>"
-                    f"{plotting.plot_dof_diagram(element, link=False)}"
-                    "<br /><small>(click to view basis functions)</small></a></center></td></tr>")
-            content += "</table>"
+    if len(element_examples) > 0:
+        content.heading("h2", "Examples")
+        example_rows = []
+        for eg in element_examples:
+            element = create_element(*eg['args'], **eg['kwargs'])
+            example_rows.append((
+                eg['name'],
+                f"<center><a href='{eg['url']}'>"
+                f"{plotting.plot_dof_diagram(element, link=False)}"
+                "<br /><small>(click to view basis functions)</small></a></center>"))
+        content.table(example_rows)
 
     # Write references section
     refs = e.references()
     if len(refs) > 0:
-        content += heading_with_self_ref("h2", "References")
+        content.heading("h2", "References")
         content += "<ul class='citations'>\n"
         for i, r in enumerate(refs):
             content += f"<li>{markup_citation(r)}"
@@ -446,20 +524,47 @@ for e in categoriser.elements:
 
     # Write created and updated dates
     if e.created is not None:
-        content += heading_with_self_ref("h2", "DefElement stats")
-        content += "<table class='element-info'>"
-        content += f"<tr><td>Element&nbsp;added</td><td>{e.created.strftime('%d %B %Y')}</td></tr>"
-        content += "<tr><td>Element&nbsp;last&nbsp;updated</td>"
-        content += f"<td>{e.modified.strftime('%d %B %Y')}</td></tr>"
-        content += "</table>"
+        content.heading("h2", "DefElement stats")
+        content.table([
+            ("Element&nbsp;added", e.created.strftime('%d %B %Y')),
+            ("Element&nbsp;last&nbsp;updated", e.modified.strftime('%d %B %Y'))])
 
     # Write file
-    write_html_page(os.path.join(settings.htmlelement_path, e.html_filename),
-                    e.html_name, content)
+    write_html_file(element_path, str(content), e.html_name)
+    plotting.finish_plots()
+
+    return element_examples, element_inputs
+
+
+# Named polynomial sets are numbered in the order they are first used. Number them all before
+# the worker processes start so that the numbering does not depend on which process builds
+# each page
+for e in categoriser.elements:
+    e.make_polynomial_set_html()
+
+plotting.close_raster_pool()
+element_pages = run_tasks(
+    "elements", make_element_page, categoriser.elements, [e.filename for e in categoriser.elements],
+    [1.0 + sum(heuristic_cost(*parse_example(eg)[:2]) for eg in e.examples)
+     if test_elements is None or e.filename in test_elements else 1.0
+     for e in categoriser.elements], cleanup=plotting.close_raster_pool)
+
+all_examples = []
+for e, (element_examples, element_inputs) in zip(categoriser.elements, element_pages):
+    all_examples += element_examples
+    element_path = os.path.join(settings.htmlelement_path, e.html_filename)
+    if element_inputs is None:
+        reuse_html_page(element_path)
+    else:
+        register_html_page(element_path, e.html_name, element_inputs)
 
 # Verification badges
+profiling.start_phase("verification")
 img = "data:image/png;base64,iVBORw0KGgoAAAANSUhEUgAAAIIAAACCCAYAAACKAxD9AAAABHNCSVQICAgIfAhkiAAACiVJREFUeJztnXmwHFUVxn8nDyEkLCoSkzLsFiIGAhHKINkw7siiCSpRiFUohKJUpBSkCgkkiohSllBKAC0FZJUXWaXQgpQBEoISAqUECYssYScYJXkhy/v8o3se8+YtM3P7znS/mfOrelU9031PfzPzvdv39j19LziO4zhOL2ywndJmoONAYDzwjqYoGhhL/54FXgM2AquA9WaDfgynBgb8BiVNB34O7Nc8OUFsIDHEk8DjwEPAcjN7PFdVrYCkb0jq1tDmVUkLJX1H0l6dnZ15f62Fpk+NIGkSsLi/fUOclcCNwPVm9s+8xRSNXj+2JIDlwIG5qGkeDwILgGvMbH3eYopApRH2Bdrpv+V14CLgF2a2Nm8xeTKs4vUhuajIj52Ac4HVkuZK2i5vQXlRaYTK1+3CSOAcYJWkWeklsq1o1x9+IEYDVwN3S9orbzHNxI3QP4cBD0ua0y61gxthYEYClwB/lLR93mIajRuhOkcDj0gq+h3WTLgRamN34H5Jn8lbSKPYKlKc80gGgxqFgB2BXYDtgX2APYFRDTxnJSOA2ySdYmYLmnjephDLCJ1mtjxSrJpJ+/0TgIOBScBkknsDjWIYcImk7czsZw08T74oGWwKYULe2gEkmaSDJP1Q0hOBn6VWvpv3520YGuJGKGfWrFlI+oikBZLWRfv5e/OtvD9nQ1ALGaEcSTtKOkPJ0HRsTsj788WgLXoNZrbWzH5C0vo/H3grYviLJU2OGC8X2sIIJcxsnZmdCXwQuCVS2G2BGyXtEileLsTqNRQabdkCw4ZNAx41s1fM7GlJRwFfAX5J0jXNwijgWklTzWyLpOHADcDOGePG4g2SxJyFc+fOvW/evHmDH60WbCNI2kXSolTnGkmnSeoo2z9W0v3hTYRezC+LOyNSzNjcImlw46vFjCBpjKR/96P3AUn7lB23taTLAj97OZsljS+L+4cIMRvBCkkjyr+rlm0jKBk1vArYrZ/dBwPLJZ2ycuVKzGyjmZ0InJ7xtB3AVZJKqf+nAkVMhRsPXDjgXrVQjSBpao3afydpm7JyJwV+B+WcVhZvXoR4jaBL0rtLOlu2RgCOqvG42cBfJI0EMLNLgTkZz32OpFJD8QJgTcZ4jWA4MKX0opWNsH8dx04GFpd+vNQMF2Q49/bA/DTWm0BRxyV6Bu1a2QjD6zx+ArBQbzeizgBuynD+EyTtmm5fTJIxXTR60q9a2QghTAJukmTp85RfJXmULoStgDOhp1a4PIrCuCwtbbgR+vIJ4MeQ3IkEvkjywG0IX5NUqn4vpFg9iIeAf5ReuBH65wxJnwZI8yzOC4wzHPhmGuc14Po48jKzCTi5/ClyN8LAXFnR8l8VGOdEJbecAS7LLisz/wVmmNmy8jfdCAOzM2lr38y6gO8FxhkFHJlu3w/8K7u0IJ4jebxvXzO7tXJnWww61cEG4F397TCzmyXdQ9LVrJfjgRvMDCXZ0B3VCkTmrREjRqirq2vAA9wIFZjZhkF2zwXuDgh7uKTRZvaSmW0iuUYXCr801Mci4IHAsjNiComNG6EO0lb2rwKL13rLOxfcCPVzPUnLu14+LumdscXEwo1QJ2kb4rqQosC0uGri4UYII3RmrsImuboRwlhE2O3i6bGFxMKNEEDaBVwcUHSc3s5eKhRuhHBCjNABHBBbSAzcCOEsrX5Iv4yLqiISboRwVgSWqydzqmm4EQIxs/8ALwYU7S+rOnfcCNl4IqDMHtFVRMCNkI0QIxTyGUk3QjbeCCizkwo4ZZ8bIRvPBZbbNqqKCLgRshGajDomqooIuBGyEbqmReFGId0IDuBGcFLcCA7gRshKd2C5Z6KqiIAbIRujA8sVbtkgN0I2xgaW2xxVRQTcCNkImY3tsSKuXOtGyMY+1Q/pQxFnT3EjhJKOF+wdULSQSxW7EcLZm7AxAzdCixG6Wm5eT0MPihshnEMDy4WmuDUUN0I4HwsoswZ4KraQGLgRApA0GvhQQNGlRew6ghuhkuGDzFT6SNlxxwbGv6e0IemxhsynKr0s6TZJn6tHmBuhdsqnx5sZGOPPAOlMax/IrKh/RgGHA7dKulFSTT0bnzGlNv4HXAkgaQ/gowExXiKZ0g6a9zDsDKBD0uerXZK8RqiNq82sNFB0SmCM28t+jC9ll1QzRwNfrnaQG6E6m4CfQs86k6GLeS1MY3SQLELeTKpqdiNU53IzK3X5TiIs3/Bl4M50+5PAe2IIq4Op1VLo3QiDs4Z0PuW0Nvh+YJxrzWxLuj0rhrA6qfoovhthcE41s9J8SecS/p98GYCkHchnUq2qafduhIH507Jly64CkLQv6ZzKAfzVzFam218gWcuh2SzxXkMYzwOzJ06ciCQDrqCG6nUALi3bzmsJ4aoLh7gR+tIFHJvOpg7wA+CgwFhPkM7AJmkS4SOWWfh1d3f3ndUOciP05WQzuxdA0iHA2RlinW9mpeb6WZmV1YdI1p04qaOj+tTPfmexNxvN7AoASbuT9P1DJ9B+muSSgpLlgncGlkfQWI31wBLgN2ZWcxKMG6E33QCHvg9IptYPTVcHONvMNgOY2XPAh7OKayR+aahg8li47rjMYf4Om38fQU7T8BqhgmuOg7FZlwyHOWaFnE5xQLxGqCCCCS4yswcjSGkqboS4PEV6S3qo4UaIy/FmVqQl/WrGjRCPs8zsvrxFhOJGiMNC4Ed5i8iCGyE7K4DjipqdXCtuhGw8AxwxVNsF5bgRwnkBmG5mz+ctJAYtYYRp06Yh6b2S9nv427BuXsNPuRqYYmahK8kXjiF1ZzHNu9sReD/J5NZ7A+OBCel7V+4/htkNlvEscFhZHmNLEMsIV0tq1HVS6d+uJA9v5MkK4Mh0EKmliGWEkJlDhhp3AMeY2bq8hTSClmgjNBgB84HPtqoJYIi1EXJgNTDbzO7KW0ijcSMMzFJgvJm9nreQZuCXhgrWbYQFS8DM/tYuJgCvEfrwqUvhvtV5q2g+lTVCyzaGaqUdTQB9jbAoFxVO7vQygpm9CAyppEsnDv01Fk8nuY3qtBF9jJDWClOAVc2Xk531m+DJtmnrx2PAbApJw4GvA8cAE4GtmyVqENaSrLX4OvAmSbLoWuBR4EmSmc9fAJB0L/VPirnBzAq3FJ+TAUn3BkxN15W37rzwG0oO4EZwUtwIDuBGcFLcCA7gg06VmKSReYtoAJtIJgEZ8AA3Qm+2Ibk/0Yq8KOlmYH7pXks5fmloH8YAc4CVkqZU7nQjtB87AHdIOqD8TTdCezICuGTcuHE9bwztJzcHIXCsod3Y08yeBq8R2p2e5QJa2Qhv5S1gCNDTa2xlIzxS/ZC2pydzo5WNcFveAoYAi0sbrWyEu0geUnH657dm9mrpRcv2GgAk7Uri+t3y1lIwVgEHlS1K0tI1Amb2LEn+pafpv82twCHlJoAWrxFKqLsbzKYCR5BMtNGOvALcPnPmzCWdnZ15a3Ecp9D8H6iRYL8kgknaAAAAAElFTkSuQmCC"  # noqa: E501
 badges = os.path.join(settings.html_path, "badges")
+badge_colours = {
+    "pass": symfem.plotting.Colors.GREEN, "partial": symfem.plotting.Colors.ORANGE,
+    "fail": "#FF0000", "unverified": "#9F9F9F"}
 for i, v in verifications.items():
     if i != "symfem":
         good = 0
@@ -469,12 +574,7 @@ for i, v in verifications.items():
                 good += len(j[i]["pass"])
                 total += len(j[i]["pass"]) + len(j[i]["fail"])
         proportion = f"{good} / {total}"
-        if good / total < 0.4:
-            col = "#FF0000"
-        elif good / total > 0.9:
-            col = symfem.plotting.Colors.GREEN
-        else:
-            col = symfem.plotting.Colors.ORANGE
+        col = badge_colours[badge_status(good, total)]
         twidth = 50 + 70 * (len(proportion) - 2)
         width = 840 + 90 + twidth
         svgwidth = width // 10 if width % 10 == 0 else width / 10
@@ -545,11 +645,13 @@ for e in categoriser.elements:
         row += "<td>"
         if e.filename in verification and i in verification[e.filename]:
             n += 1
-            result = verification[e.filename][i]
-            if len(result["fail"]) == 0:
+            status = verification_status(verification[e.filename][i])
+            if status == "pass":
                 row += green_check
-            elif len(result["pass"]) > 0:
+            elif status == "partial":
                 row += orange_check
+            elif status == "unverified":
+                row += blue_minus
             else:
                 row += red_check
         row += "</td>"
@@ -576,50 +678,51 @@ content += "</table>"
 write_html_page(os.path.join(settings.html_path, "verification.html"),
                 "Verification", content)
 
+# Machine readable export of the catalogue
+profiling.start_phase("export")
+write_export(categoriser.elements, settings.html_path, verification)
 
-def build_examples(egs, process=""):
-    for eg in egs:
-        start = datetime.now()
 
-        element = create_element(*eg['args'], **eg['kwargs'])
+def build_example(eg, process=""):
+    start = datetime.now()
 
-        markup_example(
-            element, eg['html_name'], f"/elements/{eg['element_filename']}",
-            eg['filename'])
+    element = create_element(*eg['args'], **eg['kwargs'])
 
-        end = datetime.now()
-        print(f"  {process}{eg['args'][0]} {eg['args'][1]} {eg['args'][2]}"
-              f" (completed in {(end - start).total_seconds():.2f}s)", flush=True)
+    markup_example(
+        element, eg['html_name'], f"/elements/{eg['element_filename']}",
+        eg['filename'])
+    plotting.finish_plots()
+
+    end = datetime.now()
+    print(f"  {process}{eg['args'][0]} {eg['args'][1]} {eg['args'][2]}"
+          f" (completed in {(end - start).total_seconds():.2f}s)", flush=True)
 
 
 # Make example pages
+profiling.start_phase("examples")
 print("Making examples")
-if settings.processes == 1:
-    build_examples(all_examples)
-else:
-    import multiprocessing
-
-    p = settings.processes
-    n_egs = len(all_examples)
-
-    jobs = []
-    for i in range(p):
-        process = multiprocessing.Process(
-            target=build_examples,
-            args=(all_examples[n_egs * i // p: n_egs * (i + 1) // p], f"[{i}] ")
-        )
-        jobs.append(process)
-
-    for j in jobs:
-        j.start()
+examples_to_build = []
+for eg in all_examples:
+    eg_path = os.path.join(settings.htmlelement_path, "examples", eg["filename"])
+    if os.path.isfile(eg_path) and manifest.up_to_date(eg["url"], hash_data(eg)):
+        manifest.reuse(eg["url"])
+    else:
+        examples_to_build.append(eg)
+if len(examples_to_build) < len(all_examples):
+    print(f"  Reusing {len(all_examples) - len(examples_to_build)} unchanged examples")
 
-    for j in jobs:
-        j.join()
+plotting.close_raster_pool()
+run_tasks(
+    "examples", build_example, examples_to_build,
+    [eg["filename"] for eg in examples_to_build],
+    [heuristic_cost(eg["args"][0], eg["args"][2]) for eg in examples_to_build],
+    cleanup=plotting.close_raster_pool)
 
-    for j in jobs:
-        assert j.exitcode == 0
+for eg in examples_to_build:
+    manifest.record(eg["url"], hash_data(eg))
 
 # Index page
+profiling.start_phase("index pages")
 content = heading_with_self_ref("h1", "Index of elements")
 # Generate filtering Javascript
 content += "<script type='text/javascript'>\n"
@@ -769,7 +872,7 @@ with open(os.path.join(settings.html_path, "updated-elements.xml"), "w") as f:
                      "modified"))
 
 # Category index
-os.mkdir(os.path.join(settings.htmlindices_path, "categories"))
+os.makedirs(os.path.join(settings.htmlindices_path, "categories"), exist_ok=True)
 content = heading_with_self_ref("h1", "Categories")
 for c in categoriser.categories:
     category_pages = []
@@ -797,7 +900,7 @@ write_html_page(os.path.join(settings.htmlindices_path, "categories/index.html")
                 "Categories", content)
 
 # Implementations index
-os.mkdir(os.path.join(settings.htmlindices_path, "implementations"))
+os.makedirs(os.path.join(settings.htmlindices_path, "implementations"), exist_ok=True)
 content = heading_with_self_ref("h1", "Implemented elements")
 for c, info in categoriser.implementations.items():
     category_pages = []
@@ -834,7 +937,7 @@ write_html_page(os.path.join(settings.htmlindices_path, "implementations/index.h
                 "Implemented elements", content)
 
 # Reference elements index
-os.mkdir(os.path.join(settings.htmlindices_path, "references"))
+os.makedirs(os.path.join(settings.htmlindices_path, "references"), exist_ok=True)
 content = heading_with_self_ref("h1", "Reference elements")
 for c in categoriser.references:
     refels = []
@@ -876,8 +979,10 @@ for cell in categoriser.references.keys():
 write_html_page(os.path.join(settings.html_path, "reference_numbering.html"),
                 "Reference cell numbering", content)
 
-
 # Families
+profiling.start_phase("families")
+
+
 def linked_names(dim, fname, cell):
     out = []
     for key, name in keys_and_names:
@@ -987,6 +1092,7 @@ content += "</ul>"
 write_html_page(os.path.join(settings.htmlindices_path, "index.html"), "Lists of elements", content)
 
 # Site map
+profiling.start_phase("sitemap")
 sitemap[html_local(os.path.join(settings.html_path, "sitemap.html"))] = "List of all pages"
 
 
@@ -1015,8 +1121,20 @@ def list_pages(folder):
 
 
 content = heading_with_self_ref("h1", "List of all pages") + list_pages("")
-with open(os.path.join(settings.html_path, "sitemap.html"), "w") as f:
-    f.write(make_html_page(content))
+write_html_file(os.path.join(settings.html_path, "sitemap.html"), content)
+
+plotting.close_raster_pool()
+
+# Remove pages from previous builds that are no longer generated
+for i in manifest.stale():
+    if os.path.isfile(os.path.join(settings.html_path, i[1:])):
+        os.remove(os.path.join(settings.html_path, i[1:]))
+manifest.save()
+plotting.reset_plot_store(remove=True)
+
+profiling.end_phase()
+if settings.profile:
+    profiling.write_report(settings.profile_html)
 
 end_all = datetime.now()
 print(f"Total time: {(end_all - start_all).total_seconds():.2f}s")
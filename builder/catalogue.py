@@ -0,0 +1,125 @@
+import hashlib
+import os
+import pickle
+import yaml
+from . import settings
+
+try:
+    from yaml import CFullLoader as YamlLoader
+except ImportError:
+    from yaml import FullLoader as YamlLoader
+
+# The parsed contents of each .def file, keyed on the file's path. Each entry is stored
+# pickled so that every caller gets its own copy of the data
+_definitions = None
+_changed = False
+
+
+def load_yaml(content):
+    return yaml.load(content, Loader=YamlLoader)
+
+
+def load_yaml_file(file):
+    with open(file) as f:
+        return load_yaml(f)
+
+
+def _catalogue_file():
+    return os.path.join(settings.cache_path, "catalogue.pickle")
+
+
+def _load_catalogue():
+    global _definitions
+    if _definitions is None:
+        _definitions = {}
+        if settings.use_cache and os.path.isfile(_catalogue_file()):
+            try:
+                with open(_catalogue_file(), "rb") as f:
+                    _definitions = pickle.load(f)
+            except (EOFError, pickle.UnpicklingError):
+                pass
+    return _definitions
+
+
+def save_catalogue():
+    global _changed
+    if not settings.use_cache or not _changed:
+        return
+    os.makedirs(settings.cache_path, exist_ok=True)
+    with open(f"{_catalogue_file()}.{os.getpid()}", "wb") as f:
+        pickle.dump(_definitions, f)
+    os.replace(f"{_catalogue_file()}.{os.getpid()}", _catalogue_file())
+    _changed = False
+
+
+def _parse(content):
+    return pickle.dumps(load_yaml(content))
+
+
+def _changed_files(paths):
+    # Files are only read if their modification time or size has changed. Returns the hash,
+    # stat and contents of the files whose contents have changed and need to be parsed
+    global _changed
+    definitions = _load_catalogue()
+    out = {}
+    for path in paths:
+        stat = os.stat(path)
+        if path in definitions and definitions[path]["stat"] == (stat.st_mtime_ns, stat.st_size):
+            continue
+        with open(path, "rb") as f:
+            content = f.read()
+        sha = hashlib.sha256(content).hexdigest()
+        if path in definitions and definitions[path]["hash"] == sha:
+            definitions[path]["stat"] = (stat.st_mtime_ns, stat.st_size)
+            _changed = True
+        else:
+            out[path] = (sha, (stat.st_mtime_ns, stat.st_size), content)
+    return out
+
+
+def _store(path, sha, stat, data):
+    global _changed
+    _load_catalogue()[path] = {"hash": sha, "data": data, "stat": stat}
+    _changed = True
+
+
+def load_definition(file):
+    path = os.path.realpath(file)
+    for path, (sha, stat, content) in _changed_files([path]).items():
+        _store(path, sha, stat, _parse(content))
+    return pickle.loads(_load_catalogue()[path]["data"])
+
+
+def definition_hash(file):
+    # The hash of the contents of a .def file
+    path = os.path.realpath(file)
+    load_definition(path)
+    return _load_catalogue()[path]["hash"]
+
+
+def load_definitions(folder=None, processes=None):
+    # If processes is more than 1, files that need to be parsed are parsed in a pool of
+    # processes. The output is the same however the files are parsed
+    if folder is None:
+        folder = settings.element_path
+    if processes is None:
+        processes = settings.load_processes
+    files = [file for file in sorted(os.listdir(folder))
+             if file.endswith(".def") and not file.startswith(".")]
+    paths = [os.path.realpath(os.path.join(folder, file)) for file in files]
+
+    changed = _changed_files(paths)
+    if processes > 1 and len(changed) > 1:
+        from concurrent.futures import ProcessPoolExecutor
+
+        with ProcessPoolExecutor(min(processes, len(changed))) as pool:
+            data = list(pool.map(_parse, [i[2] for i in changed.values()], chunksize=8))
+    else:
+        data = [_parse(i[2]) for i in changed.values()]
+    for (path, (sha, stat, _)), d in zip(changed.items(), data):
+        _store(path, sha, stat, d)
+
+    definitions = _load_catalogue()
+    out = {file[:-4]: pickle.loads(definitions[path]["data"]) for file, path in zip(files, paths)}
+    save_catalogue()
+    return out
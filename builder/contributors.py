@@ -0,0 +1,91 @@
+import json
+import os
+import re
+import subprocess
+import time
+import warnings
+from . import settings
+
+_contributors = {}
+
+
+def github_contributors():
+    from github import Github
+
+    g = Github(settings.github_token)
+    repo = g.get_repo("mscroggs/defelement.com")
+    pages = repo.get_contributors()
+    out = []
+    i = 0
+    while True:
+        page = pages.get_page(i)
+        if len(page) == 0:
+            break
+        out += [(user.login, user.name) for user in page]
+        i += 1
+    return out
+
+
+def git_contributors():
+    # GitHub usernames can only be found for commits made with a GitHub noreply email address
+    out = []
+    log = subprocess.run(["git", "shortlog", "-sne", "HEAD"], cwd=settings.dir_path,
+                         capture_output=True, text=True, check=True).stdout
+    for line in log.split("\n"):
+        if line.strip() != "":
+            name, email = re.match(r"^\s*[0-9]+\s+(.*) <([^>]*)>$", line).groups()
+            login = re.match(r"^(?:[0-9]+\+)?([^@]+)@users\.noreply\.github\.com$", email)
+            out.append((None if login is None else login[1], name))
+    return out
+
+
+def json_contributors(file):
+    with open(file) as f:
+        return [(i["login"], i["name"] if "name" in i else None) for i in json.load(f)]
+
+
+def _contributors_file():
+    return os.path.join(settings.cache_path, "contributors.json")
+
+
+def get_contributors():
+    # Returns a list of (GitHub username, name) pairs, or None if no source is available.
+    # Contributors from GitHub are stored on disk for settings.contributors_ttl seconds
+    source = settings.contributors_source
+    if source is None:
+        if settings.github_token is None:
+            return None
+        source = "github"
+
+    if source not in _contributors:
+        if source == "github":
+            if settings.use_cache and os.path.isfile(_contributors_file()):
+                with open(_contributors_file()) as f:
+                    cached = json.load(f)
+                if time.time() - cached["time"] < settings.contributors_ttl:
+                    _contributors[source] = [tuple(i) for i in cached["contributors"]]
+            if source not in _contributors:
+                _contributors[source] = github_contributors()
+                if settings.use_cache:
+                    os.makedirs(settings.cache_path, exist_ok=True)
+                    with open(_contributors_file(), "w") as f:
+                        json.dump({"time": time.time(), "contributors": _contributors[source]}, f)
+        elif source == "git":
+            _contributors[source] = git_contributors()
+        elif source.endswith(".json"):
+            _contributors[source] = json_contributors(source)
+        else:
+            raise ValueError(f"Unsupported contributors source: {source}")
+    return _contributors[source]
+
+
+def additional_contributors(people):
+    # Contributors who are not included in the list of people in data/contributors
+    contributors = get_contributors()
+    if contributors is None:
+        warnings.warn("Building without GitHub token. Skipping search for GitHub contributors.")
+        return None
+    logins = [info["github"] for info in people if "github" in info]
+    names = [" ".join(info["name"].split(", ")[::-1]) for info in people]
+    return [(login, name) for login, name in contributors
+            if login not in logins and (login is not None or name not in names)]
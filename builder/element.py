@@ -1,14 +1,35 @@
-import os
+import functools
 import warnings
-import yaml
-from datetime import datetime
-from github import Github
 from . import implementations
-from . import settings
+from .catalogue import load_definitions, load_yaml_file
+from .formulas import dof_count_table
 from .families import keys_and_names, arnold_logg_reference, cockburn_fu_reference
 from .implementations import VariantNotImplemented
 from .markup import insert_links
+from .pagebuilder import PageBuilder
 from .polyset import make_poly_set, make_extra_info
+from .timestamps import element_timestamps
+
+
+def _copy(value):
+    if isinstance(value, list):
+        return [_copy(i) for i in value]
+    if isinstance(value, dict):
+        return {i: _copy(j) for i, j in value.items()}
+    return value
+
+
+def derived_view(f):
+    # The view is computed lazily, the first time it is used with each set of arguments, and
+    # cached. Callers get a copy of the result, so cannot change the stored value
+    @functools.wraps(f)
+    def wrapped(self, *args, **kwargs):
+        key = (f.__name__, args, tuple(sorted(kwargs.items())))
+        if key not in self._derived:
+            self._derived[key] = f(self, *args, **kwargs)
+        return _copy(self._derived[key])
+
+    return wrapped
 
 
 def make_dof_data(ndofs):
@@ -55,6 +76,11 @@ class Categoriser:
         self.references = {}
         self.categories = {}
         self.implementations = {}
+        self._by_filename = {}
+        self._by_name = {}
+        self._by_category = {}
+        self._by_implementation = {}
+        self._by_reference = {}
 
     def recently_added(self, n):
         if self.elements[0].created is None:
@@ -74,12 +100,10 @@ class Categoriser:
                     self.add_category(a.strip(), b.strip(), f"{a.strip()}.html")
 
     def load_implementations(self, file):
-        with open(file) as f:
-            self.implementations = yaml.load(f, Loader=yaml.FullLoader)
+        self.implementations = load_yaml_file(file)
 
     def load_families(self, file):
-        with open(file) as f:
-            self.families = yaml.load(f, Loader=yaml.FullLoader)
+        self.families = load_yaml_file(file)
         for t in self.families:
             for i in self.families[t]:
                 self.families[t][i]["elements"] = {}
@@ -90,31 +114,22 @@ class Categoriser:
                 if line.strip() != "":
                     self.add_reference(line.strip(), f"{line.strip()}.html")
 
-    def load_folder(self, folder):
-        for file in os.listdir(folder):
-            if file.endswith(".def") and not file.startswith("."):
-                with open(os.path.join(folder, file)) as f:
-                    data = yaml.load(f, Loader=yaml.FullLoader)
+    def load_folder(self, folder, timestamps=True):
+        for fname, data in load_definitions(folder).items():
+            self.add_element(Element(data, fname))
 
-                fname = file[:-4]
-
-                self.add_element(Element(data, fname))
-
-        if settings.github_token is None:
-            warnings.warn("Building without GitHub token. Timestamps will not be obtained.")
-        else:
-            g = Github(settings.github_token)
-            repo = g.get_repo("mscroggs/defelement.com")
+        if timestamps:
+            times = element_timestamps(folder, [e.filename for e in self.elements])
             for e in self.elements:
-                commits = repo.get_commits(path=f"elements/{e.filename}.def")
-                try:
-                    e.created = commits.get_page(-1)[-1].commit.committer.date
-                    e.modified = commits.get_page(0)[0].commit.committer.date
-                except IndexError:
-                    e.created = datetime.now()
-                    e.modified = datetime.now()
+                e.created, e.modified = times[e.filename]
 
+        self.sort_elements()
+
+    def sort_elements(self):
         self.elements.sort(key=lambda x: x.name.lower())
+        for index in [self._by_category, self._by_implementation, self._by_reference]:
+            for elements in index.values():
+                elements.sort(key=lambda x: x.name.lower())
 
     def add_family(self, t, e, name, fname):
         if len(e.split(",")) == 3:
@@ -141,24 +156,37 @@ class Categoriser:
         return self.categories[c][0]
 
     def get_space_name(self, element, link=True):
-        for e in self.elements:
-            if e.filename == element:
-                if link:
-                    return e.html_link
-                else:
-                    return e.html_name
-                break
-        raise ValueError(f"Could not find space: {element}")
+        if element not in self._by_filename:
+            raise ValueError(f"Could not find space: {element}")
+        if link:
+            return self._by_filename[element].html_link
+        else:
+            return self._by_filename[element].html_name
+
+    def get_element_by_filename(self, fname):
+        if fname not in self._by_filename:
+            raise ValueError(f"Could not find element: {fname}")
+        return self._by_filename[fname]
 
     def get_element(self, ename):
-        for e in self.elements:
-            if e.name == ename:
-                return e
-        raise ValueError(f"Could not find element: {ename}")
+        if ename not in self._by_name:
+            raise ValueError(f"Could not find element: {ename}")
+        return self._by_name[ename]
 
     def add_element(self, e):
         self.elements.append(e)
         e._c = self
+        self._by_filename[e.filename] = e
+        self._by_name[e.name] = e
+        for index, keys in [
+            (self._by_category, e.categories(False, False)),
+            (self._by_implementation, e._data.get("implementations", {})),
+            (self._by_reference, e.reference_elements(False)),
+        ]:
+            for i in keys:
+                if i not in index:
+                    index[i] = []
+                index[i].append(e)
         for r in e.reference_elements(False):
             assert r in self.references
 
@@ -167,22 +195,43 @@ class Categoriser:
                 self.add_family(j, i, e.html_name, e.html_filename)
 
     def elements_in_category(self, c):
-        return [e for e in self.elements if c in e.categories(False, False)]
+        return list(self._by_category.get(c, []))
 
     def elements_in_implementation(self, i):
-        return [e for e in self.elements if e.implemented(i)]
+        return list(self._by_implementation.get(i, []))
 
     def elements_by_reference(self, r):
-        return [e for e in self.elements if r in e.reference_elements(False)]
+        return list(self._by_reference.get(r, []))
 
 
 class Element:
+    # Elements are not immutable: their views are computed lazily and cached, as some views
+    # depend on the Categoriser's families and categories, which are loaded after the
+    # elements. The cached views are only correct as long as the definition is not changed,
+    # so the definition is kept private and the data property gives a copy of it
+    __slots__ = ("_data", "filename", "_c", "created", "modified", "_derived")
+
     def __init__(self, data, fname):
-        self.data = data
+        self._data = data
         self.filename = fname
         self._c = None
         self.created = None
         self.modified = None
+        self._derived = {}
+
+    @property
+    def data(self):
+        return _copy(self._data)
+
+    def __getstate__(self):
+        # Derived views are not stored when pickling, as some of them depend on the state of
+        # other modules (eg the numbering of polynomial sets)
+        return {i: getattr(self, i) for i in self.__slots__ if i != "_derived"}
+
+    def __setstate__(self, state):
+        for i, j in state.items():
+            setattr(self, i, j)
+        self._derived = {}
 
     def name_with_variant(self, variant):
         if variant is None:
@@ -190,48 +239,51 @@ class Element:
         return f"{self.name} ({self.variant_name(variant)} variant)"
 
     def variant_name(self, variant):
-        return self.data["variants"][variant]["variant-name"]
+        return self._data["variants"][variant]["variant-name"]
 
+    @derived_view
     def variants(self):
-        if "variants" not in self.data:
+        if "variants" not in self._data:
             return []
         return [
             f"{v['variant-name']}: {v['description']}"
-            for v in self.data["variants"].values()
+            for v in self._data["variants"].values()
         ]
 
     def min_order(self, ref):
-        if "min-order" not in self.data:
+        if "min-order" not in self._data:
             return 0
-        if isinstance(self.data["min-order"], dict):
-            return self.data["min-order"][ref]
-        return self.data["min-order"]
+        if isinstance(self._data["min-order"], dict):
+            return self._data["min-order"][ref]
+        return self._data["min-order"]
 
     def max_order(self, ref):
-        if "max-order" not in self.data:
+        if "max-order" not in self._data:
             return None
-        if isinstance(self.data["max-order"], dict):
-            return self.data["max-order"][ref]
-        return self.data["max-order"]
+        if isinstance(self._data["max-order"], dict):
+            return self._data["max-order"][ref]
+        return self._data["max-order"]
 
+    @derived_view
     def reference_elements(self, link=True):
         if link:
             return [f"<a href='/lists/references/{e}.html'>{e}</a>"
-                    for e in self.data["reference-elements"]]
+                    for e in self._data["reference-elements"]]
         else:
-            return self.data["reference-elements"]
+            return self._data["reference-elements"]
 
+    @derived_view
     def alternative_names(
         self, include_bracketed=True, include_complexes=True, include_variants=True, link=True,
         strip_cell_name=False, cell=None
     ):
-        if "alt-names" not in self.data:
+        if "alt-names" not in self._data:
             return []
-        out = self.data["alt-names"]
+        out = list(self._data["alt-names"])
         if include_complexes:
             out += self.family_names(link=link)
-        if include_variants and "variants" in self.data:
-            for v in self.data["variants"].values():
+        if include_variants and "variants" in self._data:
+            for v in self._data["variants"].values():
                 if "names" in v:
                     out += [f"{i} ({v['variant-name']} variant)" for i in v["names"]]
 
@@ -249,32 +301,34 @@ class Element:
 
         return out
 
+    @derived_view
     def short_names(self, include_variants=True):
         out = []
-        if "short-names" in self.data:
-            out += self.data["short-names"]
-        if include_variants and "variants" in self.data:
-            for v in self.data["variants"].values():
+        if "short-names" in self._data:
+            out += self._data["short-names"]
+        if include_variants and "variants" in self._data:
+            for v in self._data["variants"].values():
                 if "short-names" in v:
                     out += [f"{i} ({v['variant-name']} variant)" for i in v["short-names"]]
         return out
 
     def mapping(self):
-        if "mapping" not in self.data:
+        if "mapping" not in self._data:
             return None
-        return self.data["mapping"]
+        return self._data["mapping"]
 
     def sobolev(self):
-        if "sobolev" not in self.data:
+        if "sobolev" not in self._data:
             return None
-        return self.data["sobolev"]
+        return self._data["sobolev"]
 
+    @derived_view
     def complexes(self, link=True, names=True):
-        if "complexes" not in self.data:
+        if "complexes" not in self._data:
             return {}
 
         out = {}
-        com = self.data["complexes"]
+        com = self._data["complexes"]
         for key, families in com.items():
             out[key] = []
             if not isinstance(families, (list, tuple)):
@@ -303,6 +357,7 @@ class Element:
                     out[key].append(e)
         return out
 
+    @derived_view
     def order_range(self):
         def make_order_data(min_o, max_o):
             if isinstance(min_o, dict):
@@ -320,21 +375,23 @@ class Element:
             return f"\\({min_o}\\leqslant k\\leqslant {max_o}\\)"
 
         return make_order_data(
-            self.data["min-order"] if "min-order" in self.data else 0,
-            self.data["max-order"] if "max-order" in self.data else None)
+            self._data["min-order"] if "min-order" in self._data else 0,
+            self._data["max-order"] if "max-order" in self._data else None)
 
+    @derived_view
     def sub_elements(self, link=True):
         assert self.is_mixed
         out = []
-        for e in self.data["mixed"]:
+        for e in self._data["mixed"]:
             element, order = e.split("(")
             order = order.split(")")[0]
             space_link = self._c.get_space_name(element, link=link)
             out.append(f"<li>order \\({order}\\) {space_link} space</li>")
         return out
 
+    @derived_view
     def make_dof_descriptions(self):
-        if "dofs" not in self.data:
+        if "dofs" not in self._data:
             return ""
 
         def dofs_on_entity(entity, dofs):
@@ -384,20 +441,21 @@ class Element:
                         dof_data.append(f"{i}{post}: {dofs_on_entity(j, data[j])}")
             return "<br />\n".join(dof_data)
 
-        return make_dof_d(self.data["dofs"])
+        return make_dof_d(self._data["dofs"])
 
+    @derived_view
     def make_polynomial_set_html(self):
         # TODO: move some of this to polynomial file
-        if "polynomial-set" not in self.data:
+        if "polynomial-set" not in self._data:
             return []
         psets = {}
-        for i, j in self.data["polynomial-set"].items():
+        for i, j in self._data["polynomial-set"].items():
             if j not in psets:
                 psets[j] = []
             psets[j].append(i)
         if (
-            "reference-elements" in self.data and len(psets) == 1
-            and len(list(psets.values())[0]) == len(self.data["reference-elements"])
+            "reference-elements" in self._data and len(psets) == 1
+            and len(list(psets.values())[0]) == len(self._data["reference-elements"])
         ):
             out = f"\\({make_poly_set(list(psets.keys())[0])}\\)<br />"
         else:
@@ -406,55 +464,44 @@ class Element:
                 out += f"\\({make_poly_set(i)}\\) ({', '.join(j)})<br />\n"
         extra = make_extra_info(" && ".join(psets.keys()))
         if len(extra) > 0:
-            out += "<a id='show_pset_link' href='javascript:show_psets()'"
-            out += " style='display:block'>"
-            out += "&darr; Show polynomial set definitions &darr;</a>"
-            out += "<a id='hide_pset_link' href='javascript:hide_psets()'"
-            out += " style='display:none'>"
-            out += "&uarr; Hide polynomial set definitions &uarr;</a>"
-            out += "<div id='psets' style='display:none'>"
-            out += extra
-            out += "</div>"
-            out += "<script type='text/javascript'>\n"
-            out += "function show_psets(){\n"
-            out += "  document.getElementById('show_pset_link').style.display = 'none'\n"
-            out += "  document.getElementById('hide_pset_link').style.display = 'block'\n"
-            out += "  document.getElementById('psets').style.display = 'block'\n"
-            out += "}\n"
-            out += "function hide_psets(){\n"
-            out += "  document.getElementById('show_pset_link').style.display = 'block'\n"
-            out += "  document.getElementById('hide_pset_link').style.display = 'none'\n"
-            out += "  document.getElementById('psets').style.display = 'none'\n"
-            out += "}\n"
-            out += "</script>"
-        return out
+            out = PageBuilder(out)
+            out.show_hide("pset", "Show polynomial set definitions",
+                          "Hide polynomial set definitions", extra)
+        return str(out)
 
+    @derived_view
     def dof_counts(self):
-        if "ndofs" not in self.data:
+        if "ndofs" not in self._data:
             return ""
-        return make_dof_data(self.data["ndofs"])
+        return make_dof_data(self._data["ndofs"])
 
+    @derived_view
     def entity_dof_counts(self):
-        if "entity-ndofs" not in self.data:
+        if "entity-ndofs" not in self._data:
             return ""
-        return make_dof_data(self.data["entity-ndofs"])
+        return make_dof_data(self._data["entity-ndofs"])
+
+    def dof_count_tables(self, orders):
+        return {key: dof_count_table(self._data[key], orders)
+                for key in ["ndofs", "entity-ndofs"] if key in self._data}
 
     @property
     def name(self):
-        return self.data["name"]
+        return self._data["name"]
 
     @property
+    @derived_view
     def notes(self):
-        if "notes" not in self.data:
+        if "notes" not in self._data:
             return []
-        return self.data["notes"]
+        return self._data["notes"]
 
     @property
     def html_name(self):
-        if "html-name" in self.data:
-            return self.data["html-name"]
+        if "html-name" in self._data:
+            return self._data["html-name"]
         else:
-            return self.data["name"]
+            return self._data["name"]
 
     @property
     def html_filename(self):
@@ -462,23 +509,23 @@ class Element:
 
     @property
     def is_mixed(self):
-        return "mixed" in self.data
+        return "mixed" in self._data
 
     @property
     def html_link(self):
         return f"<a href='/elements/{self.html_filename}'>{self.html_name}</a>"
 
     def implemented(self, lib):
-        return "implementations" in self.data and lib in self.data["implementations"]
+        return "implementations" in self._data and lib in self._data["implementations"]
 
     def get_implementation_string(self, lib, reference, variant=None):
         assert self.implemented(lib)
         if variant is None:
-            data = self.data["implementations"][lib]
+            data = self._data["implementations"][lib]
         else:
-            if variant not in self.data["implementations"][lib]:
+            if variant not in self._data["implementations"][lib]:
                 raise VariantNotImplemented()
-            data = self.data["implementations"][lib][variant]
+            data = self._data["implementations"][lib][variant]
         if isinstance(data, dict):
             if reference not in data:
                 return None, {}
@@ -501,25 +548,28 @@ class Element:
             return out.split(" variant=")
         return out, None
 
-    def list_of_implementation_strings(self, lib, joiner="<br />"):
+    @derived_view
+    def implementation_strings(self, lib):
+        # Maps each string used to create this element in a library to the reference elements
+        # and variants that it is used for
         assert self.implemented(lib)
 
-        if "display" in self.data["implementations"][lib]:
-            d = implementations.formats[lib](self.data["implementations"][lib]["display"], {})
-            return f"<code>{d}</code>"
-        if "variants" in self.data:
-            variants = self.data["variants"]
+        if "display" in self._data["implementations"][lib]:
+            d = implementations.formats[lib](self._data["implementations"][lib]["display"], {})
+            return {d: []}
+        if "variants" in self._data:
+            variants = self._data["variants"]
         else:
             variants = {None: {}}
 
         i_dict = {}
         for v, vinfo in variants.items():
             if v is None:
-                data = self.data["implementations"][lib]
+                data = self._data["implementations"][lib]
             else:
-                if v not in self.data["implementations"][lib]:
+                if v not in self._data["implementations"][lib]:
                     continue
-                data = self.data["implementations"][lib][v]
+                data = self._data["implementations"][lib][v]
             if isinstance(data, str):
                 s = implementations.formats[lib](*self.get_implementation_string(lib, None, v))
                 if s not in i_dict:
@@ -537,6 +587,11 @@ class Element:
                         i_dict[s].append(i)
                     else:
                         i_dict[s].append(f"{i}, {vinfo['variant-name']}")
+        return i_dict
+
+    @derived_view
+    def list_of_implementation_strings(self, lib, joiner="<br />"):
+        i_dict = self.implementation_strings(lib)
         if len(i_dict) == 1:
             return f"<code>{list(i_dict.keys())[0]}</code>"
         imp_list = [f"<code>{i}</code> <span style='font-size:60%'>({'; '.join(j)})</span>"
@@ -552,24 +607,26 @@ class Element:
     def has_implementation_examples(self, lib):
         return lib in implementations.examples
 
+    @derived_view
     def categories(self, link=True, map_name=True):
-        if "categories" not in self.data:
+        if "categories" not in self._data:
             return []
         if map_name:
-            cnames = {c: self._c.get_category_name(c) for c in self.data["categories"]}
+            cnames = {c: self._c.get_category_name(c) for c in self._data["categories"]}
         else:
-            cnames = {c: c for c in self.data["categories"]}
+            cnames = {c: c for c in self._data["categories"]}
         if link:
             return [f"<a href='/lists/categories/{c}.html'>{cnames[c]}</a>"
-                    for c in self.data["categories"]]
+                    for c in self._data["categories"]]
         else:
-            return [f"{cnames[c]}" for c in self.data["categories"]]
+            return [f"{cnames[c]}" for c in self._data["categories"]]
 
+    @derived_view
     def references(self):
-        references = self.data["references"] if "references" in self.data else []
+        references = list(self._data["references"]) if "references" in self._data else []
 
-        if "complexes" in self.data:
-            for key, families in self.data["complexes"].items():
+        if "complexes" in self._data:
+            for key, families in self._data["complexes"].items():
                 if not isinstance(families, (list, tuple)):
                     families = [families]
                 for e in families:
@@ -592,14 +649,15 @@ class Element:
 
     @property
     def test(self):
-        return "test" in self.data
+        return "test" in self._data
 
     @property
     def has_examples(self):
-        return "examples" in self.data
+        return "examples" in self._data
 
     @property
+    @derived_view
     def examples(self):
-        if "examples" not in self.data:
+        if "examples" not in self._data:
             return []
-        return self.data["examples"]
+        return self._data["examples"]
@@ -3,8 +3,9 @@ import sympy
 from symfem.finite_element import CiarletElement, DirectElement
 from symfem.functions import AnyFunction
 from symfem.symbols import t
-from .html import make_html_page
-from .markup import heading_with_self_ref
+from .html import write_html_file
+from .pagebuilder import PageBuilder
+from .symfem_cache import save_element
 from . import settings, symbols, plotting
 
 defelement_t = ["s_{0}", "s_{1}", "s_{2}"]
@@ -56,17 +57,17 @@ def describe_dof(element, d):
 
 
 def markup_example(element, html_name, element_page, fname):
-    eg = heading_with_self_ref(
-        "h1", f"Degree {element.order} {html_name} on a {element.reference.name}")
+    eg = PageBuilder()
+    eg.heading("h1", f"Degree {element.order} {html_name} on a {element.reference.name}")
     eg += "\n"
     eg += f"<a href='{element_page}'><small>&#9664; Back to {html_name} definition page"
     eg += "</a></small>\n"
-    eg += "<center>" + plotting.plot_dof_diagram(element) + "</center>\n"
+    eg.add("<center>", plotting.plot_dof_diagram(element), "</center>\n")
     eg += "In this example:\n<ul>\n"
     # Reference
     eg += f"<li>\\({symbols.reference}\\) is the reference {element.reference.name}."
     eg += " The following numbering of the subentities of the reference is used:</li>\n"
-    eg += "<center>" + plotting.plot_reference(element.reference) + "</center>\n"
+    eg.add("<center>", plotting.plot_reference(element.reference), "</center>\n")
     if isinstance(element, CiarletElement) and element.reference.name != "dual polygon":
         # Polynomial set
         eg += f"<li>\\({symbols.polyset}\\) is spanned by: "
@@ -96,12 +97,12 @@ def markup_example(element, html_name, element_page, fname):
             dof = element.dofs[dof_i]
             eg += f"\\(\\displaystyle {symbols.functional}_{{{dof_i}}}:"
             dof_tex, symbols_used = describe_dof(element, dof)
-            eg += dof_tex + "\\)"
+            eg.add(dof_tex, "\\)")
             if len(symbols_used) > 0:
                 eg += "<br />where " + ";<br />".join(symbols_used[:-1])
                 if len(symbols_used) > 1:
                     eg += ";<br />and "
-                eg += symbols_used[-1] + "."
+                eg.add(symbols_used[-1], ".")
             eg += "<br /><br />"
         if element.range_dim == 1:
             eg += f"\\(\\displaystyle {symbols.basis_function}_{{{dof_i}}} = "
@@ -109,7 +110,7 @@ def markup_example(element, html_name, element_page, fname):
             eg += f"\\(\\displaystyle {symbols.vector_basis_function}_{{{dof_i}}} = "
         else:
             eg += f"\\(\\displaystyle {symbols.matrix_basis_function}_{{{dof_i}}} = "
-        eg += to_tex(func) + "\\)"
+        eg.add(to_tex(func), "\\)")
         if isinstance(element, CiarletElement):
             if len(element.dofs) > 0:
                 eg += "<br /><br />"
@@ -125,7 +126,8 @@ def markup_example(element, html_name, element_page, fname):
         eg += "</div>"
         eg += "</div>"
 
-    with open(os.path.join(os.path.join(settings.htmlelement_path, "examples", fname)), "w") as f:
-        f.write(make_html_page(eg))
+    write_html_file(os.path.join(settings.htmlelement_path, "examples", fname), str(eg))
+
+    save_element(element)
 
     return f"/elements/examples/{fname}"
@@ -0,0 +1,102 @@
+import argparse
+import json
+import os
+from . import settings
+from .verification import verification_status
+
+# The orders that the number of DOFs is evaluated at in the export
+export_orders = list(range(6))
+
+
+def _in_range(e, ref, k):
+    max_o = e.max_order(ref)
+    return e.min_order(ref) <= k and (max_o is None or k <= max_o)
+
+
+def _in_orders(e, refs, table):
+    # Only include the orders that the element is defined for on at least one of the cells
+    return {k: n for k, n in table.items() if any(_in_range(e, r, k) for r in refs)}
+
+
+def _dof_counts(e):
+    tables = e.dof_count_tables(export_orders)
+    out = {}
+    if "ndofs" in tables:
+        out["ndofs"] = {ref: _in_orders(e, [ref.split("(")[0]], table)
+                        for ref, table in tables["ndofs"].items()}
+    if "entity-ndofs" in tables:
+        out["entity-ndofs"] = {}
+        for entity, table in tables["entity-ndofs"].items():
+            if "formula" in e.data["entity-ndofs"][entity]:
+                out["entity-ndofs"][entity] = _in_orders(e, e.reference_elements(False), table)
+            else:
+                out["entity-ndofs"][entity] = {
+                    ref: _in_orders(e, [ref.split("(")[0]], t) for ref, t in table.items()}
+    return out
+
+
+def element_record(e, verification={}):
+    refs = e.reference_elements(False)
+    data = e.data
+    return {
+        "filename": e.filename,
+        "name": e.name,
+        "html-name": e.html_name,
+        "url": f"/elements/{e.html_filename}",
+        "alt-names": e.alternative_names(
+            include_complexes=False, include_variants=False, link=False),
+        "short-names": e.short_names(False),
+        "variants": {
+            v: {"name": info["variant-name"], "description": info["description"]}
+            for v, info in (data["variants"] if "variants" in data else {}).items()},
+        "reference-elements": refs,
+        "orders": {r: {"min": e.min_order(r), "max": e.max_order(r)} for r in refs},
+        "ndofs": data["ndofs"] if "ndofs" in data else {},
+        "entity-ndofs": data["entity-ndofs"] if "entity-ndofs" in data else {},
+        "dof-counts": _dof_counts(e),
+        "mapping": e.mapping(),
+        "sobolev": e.sobolev(),
+        "categories": data["categories"] if "categories" in data else [],
+        "mixed": data["mixed"] if "mixed" in data else None,
+        "implementations": {
+            lib: e.implementation_strings(lib)
+            for lib in (data["implementations"] if "implementations" in data else {})},
+        "verification": {
+            lib: {"status": verification_status(result), **result}
+            for lib, result in verification.items()},
+        "created": None if e.created is None else e.created.isoformat(),
+        "modified": None if e.modified is None else e.modified.isoformat(),
+    }
+
+
+def write_export(elements, folder, verification={}):
+    # Write one record per line to elements.ndjson, and all the records as a single JSON list
+    # to elements.json. Records are written as they are made
+    with open(os.path.join(folder, "elements.ndjson"), "w") as f_nd:
+        with open(os.path.join(folder, "elements.json"), "w") as f_js:
+            f_js.write("[")
+            for i, e in enumerate(elements):
+                line = json.dumps(element_record(
+                    e, verification[e.filename] if e.filename in verification else {}))
+                f_nd.write(f"{line}\n")
+                f_js.write(f"{',' if i > 0 else ''}\n{line}")
+            f_js.write("\n]\n")
+
+
+if __name__ == "__main__":
+    from .snapshot import load_categoriser
+
+    parser = argparse.ArgumentParser(description="Export the DefElement catalogue as JSON")
+    parser.add_argument('destination', metavar='destination', nargs="?",
+                        default=".", help="Folder to write elements.json and elements.ndjson to.")
+    parser.add_argument('--verification-json', metavar="verification_json", default=None,
+                        help="Provide a verification JSON.")
+    args = parser.parse_args()
+    if args.verification_json is not None:
+        settings.verification_json = args.verification_json
+
+    verification = {}
+    if os.path.isfile(settings.verification_json):
+        with open(settings.verification_json) as f:
+            verification = json.load(f)
+    write_export(load_categoriser().elements, args.destination, verification)
@@ -0,0 +1,203 @@
+import re
+import numpy as np
+
+# Formulas for the number of DOFs are written as in the .def files, eg (k+1)(k+2)/2, 3k^2 or
+# a list of cases such as [{"k=1": 4}, {"k>1": "k(k+3)/2+3"}]. They are parsed once into
+# functions that evaluate the formula for an array of orders
+
+
+class FormulaError(ValueError):
+    pass
+
+
+_token = re.compile(r"\s*(?:([0-9]+)|([kn])|([-+*/^()]))")
+_condition = re.compile(r"^k\s*(?:=\s*([0-9]+(?:\s*,\s*[0-9]+)*)|([<>]=?)\s*([0-9]+))$")
+
+
+def _tokenize(formula):
+    tokens = []
+    position = 0
+    formula = formula.rstrip()
+    while position < len(formula):
+        match = _token.match(formula, position)
+        if match is None:
+            raise FormulaError(f"Unexpected character in formula: {formula[position:]}")
+        number, variable, operator = match.groups()
+        if number is not None:
+            token = int(number)
+        else:
+            token = variable if variable is not None else operator
+        # Multiplication can be implied, eg 2(k+1), 3k or (k+1)(k+2)
+        if len(tokens) > 0 and (
+            isinstance(tokens[-1], int) or tokens[-1] in ["k", "n", ")"]
+        ) and (token in ["k", "n", "("] or (isinstance(token, int) and tokens[-1] == ")")):
+            tokens.append("*")
+        tokens.append(token)
+        position = match.end()
+    return tokens
+
+
+class _Parser:
+    def __init__(self, formula):
+        self.formula = formula
+        self.tokens = _tokenize(formula)
+        self.position = 0
+        self.variables = set()
+
+    def peek(self):
+        if self.position < len(self.tokens):
+            return self.tokens[self.position]
+        return None
+
+    def take(self):
+        token = self.peek()
+        if token is None:
+            raise FormulaError(f"Unexpected end of formula: {self.formula}")
+        self.position += 1
+        return token
+
+    def parse(self):
+        out = self.expression()
+        if self.peek() is not None:
+            raise FormulaError(f"Unexpected {self.peek()} in formula: {self.formula}")
+        return out
+
+    def expression(self):
+        out = self.term()
+        while self.peek() in ["+", "-"]:
+            op = self.take()
+            a, b = out, self.term()
+            if op == "+":
+                out = (lambda a, b: lambda v: a(v) + b(v))(a, b)
+            else:
+                out = (lambda a, b: lambda v: a(v) - b(v))(a, b)
+        return out
+
+    def term(self):
+        out = self.unary()
+        while self.peek() in ["*", "/"]:
+            op = self.take()
+            a, b = out, self.unary()
+            if op == "*":
+                out = (lambda a, b: lambda v: a(v) * b(v))(a, b)
+            else:
+                out = (lambda a, b: lambda v: np.floor_divide(a(v), b(v)))(a, b)
+        return out
+
+    def unary(self):
+        if self.peek() == "-":
+            self.take()
+            a = self.unary()
+            return lambda v: -a(v)
+        return self.power()
+
+    def power(self):
+        out = self.atom()
+        if self.peek() == "^":
+            self.take()
+            a, b = out, self.unary()
+            out = (lambda a, b: lambda v: np.power(a(v), b(v)))(a, b)
+        return out
+
+    def atom(self):
+        token = self.take()
+        if isinstance(token, int):
+            return lambda v: token
+        if token in ["k", "n"]:
+            self.variables.add(token)
+            return lambda v: v[token]
+        if token == "(":
+            out = self.expression()
+            if self.take() != ")":
+                raise FormulaError(f"Unbalanced brackets in formula: {self.formula}")
+            return out
+        raise FormulaError(f"Unexpected {token} in formula: {self.formula}")
+
+
+def _compile_condition(condition):
+    match = _condition.match(condition.strip())
+    if match is None:
+        raise FormulaError(f"Unsupported condition: {condition}")
+    values, op, bound = match.groups()
+    if values is not None:
+        values = [int(i) for i in values.split(",")]
+        return lambda k: np.isin(k, values)
+    bound = int(bound)
+    return {
+        "<": lambda k: k < bound, "<=": lambda k: k <= bound,
+        ">": lambda k: k > bound, ">=": lambda k: k >= bound}[op]
+
+
+class DofFormula:
+    def __init__(self, formula):
+        self.formula = formula
+        self.cases = []
+        self.variables = set()
+        if isinstance(formula, list):
+            for case in formula:
+                if not isinstance(case, dict) or len(case) != 1:
+                    raise FormulaError(f"Each case must have one condition: {formula}")
+                for condition, f in case.items():
+                    self.cases.append((_compile_condition(condition), self._compile(f)))
+        else:
+            self.cases.append((None, self._compile(formula)))
+
+    def _compile(self, formula):
+        if isinstance(formula, int) and not isinstance(formula, bool):
+            return lambda v: formula
+        if not isinstance(formula, str):
+            raise FormulaError(f"Unsupported formula: {formula}")
+        parser = _Parser(formula)
+        out = parser.parse()
+        self.variables |= parser.variables
+        return out
+
+    def defined(self, k):
+        k = np.asarray(k)
+        if self.cases[0][0] is None:
+            return np.ones(k.shape, dtype=bool)
+        return np.any([c(k) for c, _ in self.cases], axis=0)
+
+    def __call__(self, k, n=None):
+        # Evaluate the formula for an array of orders. Returns a masked array in which the
+        # orders where the formula is not defined are masked
+        k = np.asarray(k, dtype=np.int64)
+        if "n" in self.variables and n is None:
+            raise FormulaError(f"A value of n is needed to evaluate: {self.formula}")
+        v = {"k": k, "n": n}
+        out = np.zeros(k.shape, dtype=np.int64)
+        done = np.zeros(k.shape, dtype=bool)
+        for condition, f in self.cases:
+            mask = ~done if condition is None else condition(k) & ~done
+            out[mask] = np.broadcast_to(f(v), k.shape)[mask]
+            done |= mask
+        return np.ma.masked_array(out, mask=~done)
+
+
+_compiled = {}
+
+
+def compile_formula(formula):
+    key = repr(formula)
+    if key not in _compiled:
+        _compiled[key] = DofFormula(formula)
+    return _compiled[key]
+
+
+def dof_count_table(ndofs, orders):
+    # Evaluate every formula in an ndofs or entity-ndofs entry for the given orders. Formulas
+    # that depend on n, or orders where a formula is not defined, are skipped
+    if isinstance(ndofs, dict) and "formula" in ndofs:
+        f = compile_formula(ndofs["formula"])
+        if "n" in f.variables:
+            return None
+        values = f(orders)
+        return {int(k): int(v) for k, v, m in zip(orders, values.data, values.mask) if not m}
+    if isinstance(ndofs, dict):
+        out = {}
+        for i, j in ndofs.items():
+            table = dof_count_table(j, orders)
+            if table is not None:
+                out[i] = table
+        return out
+    return None
@@ -2,16 +2,38 @@ import os
 from . import settings
 from .markup import insert_dates
 
+_templates = {}
 
-def make_html_page(content, pagetitle=None):
-    out = ""
-    with open(os.path.join(settings.template_path, "intro.html")) as f:
-        out += insert_dates(f.read())
-    if pagetitle is None:
-        out = out.replace("{{: pagetitle}}", "")
-    else:
-        out = out.replace("{{: pagetitle}}", f": {pagetitle}")
-    out += content
-    with open(os.path.join(settings.template_path, "outro.html")) as f:
-        out += insert_dates(f.read())
+
+def load_template(name):
+    # Templates are read and have their dates and symbols inserted once per process
+    key = (settings.template_path, name)
+    if key not in _templates:
+        with open(os.path.join(settings.template_path, name)) as f:
+            _templates[key] = insert_dates(f.read()).split("{{: pagetitle}}")
+    return _templates[key]
+
+
+def _fill_template(name, pagetitle):
+    parts = load_template(name)
+    if len(parts) == 1:
+        return parts
+    title = "" if pagetitle is None else f": {pagetitle}"
+    out = [parts[0]]
+    for p in parts[1:]:
+        out += [title, p]
     return out
+
+
+def html_page_parts(content, pagetitle=None):
+    return _fill_template("intro.html", pagetitle) + [content] + _fill_template(
+        "outro.html", pagetitle)
+
+
+def make_html_page(content, pagetitle=None):
+    return "".join(html_page_parts(content, pagetitle))
+
+
+def write_html_file(path, content, pagetitle=None):
+    with open(path, "w", buffering=1 << 16) as f:
+        f.writelines(html_page_parts(content, pagetitle))
@@ -288,7 +288,7 @@ def to_array(data):
 
 
 def symfem_tabulate(element, example):
-    import symfem
+    from .symfem_cache import create_element, save_element, table_key, load_table, save_table
 
     ref, ord, variant, kwargs = parse_example(example)
     ord = int(ord)
@@ -296,9 +296,16 @@ def symfem_tabulate(element, example):
     assert symfem_name is not None
     if ref == "dual polygon":
         ref += "(4)"
-    e = symfem.create_element(ref, symfem_name, ord, **params)
-    table = to_array(e.tabulate_basis(points(ref), "xx,yy,zz"))
-    return table.reshape(table.shape[0], e.range_dim, e.space_dim)
+    # Tabulating symfem elements is slow, so the tables are stored and reused by later runs
+    key = table_key(ref, symfem_name, ord, points(ref), **params)
+    table = load_table(key)
+    if table is None:
+        e = create_element(ref, symfem_name, ord, **params)
+        table = to_array(e.tabulate_basis(points(ref), "xx,yy,zz"))
+        save_element(e)
+        table = table.reshape(table.shape[0], e.range_dim, e.space_dim)
+        save_table(key, table)
+    return table
 
 
 def basix_tabulate(element, example):
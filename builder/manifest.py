@@ -0,0 +1,70 @@
+import hashlib
+import json
+import os
+import symfem
+from . import settings
+
+
+def hash_data(data):
+    return hashlib.sha256(json.dumps(data, sort_keys=True, default=str).encode()).hexdigest()
+
+
+def hash_files(paths):
+    h = hashlib.sha256()
+    for path in sorted(paths):
+        h.update(path.encode())
+        with open(path, "rb") as f:
+            h.update(f.read())
+    return h.hexdigest()
+
+
+def shared_inputs():
+    paths = [os.path.join(settings.dir_path, "build.py")]
+    for folder, ext in [
+        (settings.template_path, ".html"), (settings.data_path, ""),
+        (os.path.join(settings.dir_path, "builder"), ".py"), (settings.dir_path, ".md"),
+        (os.path.join(settings.dir_path, "people"), ""),
+    ]:
+        for file in os.listdir(folder):
+            if file.endswith(ext) and not file.startswith("."):
+                if os.path.isfile(os.path.join(folder, file)):
+                    paths.append(os.path.join(folder, file))
+    return paths
+
+
+def shared_hash():
+    return hash_data([hash_files(shared_inputs()), symfem.__version__])
+
+
+class Manifest:
+    def __init__(self, file, incremental=False):
+        self.file = file
+        self.shared = shared_hash()
+        self.old = {}
+        self.new = {}
+        if incremental and os.path.isfile(file):
+            with open(file) as f:
+                data = json.load(f)
+            if data["shared"] == self.shared:
+                self.old = data["outputs"]
+
+    @property
+    def is_empty(self):
+        return len(self.old) == 0
+
+    def up_to_date(self, key, inputs):
+        return key in self.old and self.old[key]["hash"] == inputs
+
+    def reuse(self, key):
+        self.new[key] = self.old[key]
+        return self.old[key]
+
+    def record(self, key, inputs, **info):
+        self.new[key] = {"hash": inputs, **info}
+
+    def stale(self):
+        return [i for i in self.old if i not in self.new]
+
+    def save(self):
+        with open(self.file, "w") as f:
+            json.dump({"shared": self.shared, "outputs": self.new}, f)
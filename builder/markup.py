@@ -1,16 +1,13 @@
 import os
 import re
 import shlex
-import symfem
-import warnings
-import yaml
 from datetime import datetime
-from github import Github
 from . import symbols
-from . import plotting
 from . import settings
+from .catalogue import load_yaml_file
+from .contributors import additional_contributors
 from .citations import markup_citation
-from urllib.parse import quote_plus
+from .pagebuilder import PageBuilder, heading_with_self_ref
 
 page_references = []
 
@@ -19,11 +16,6 @@ def cap_first(txt):
     return txt[:1].upper() + txt[1:]
 
 
-def heading_with_self_ref(hx, content):
-    id = quote_plus(content)
-    return f"<{hx} id=\"{id}\"><a href=\"#{id}\">{content}</a></{hx}>\n"
-
-
 def format_names(names, format):
     if format == "bibtex":
         return " and ".join(names)
@@ -53,10 +45,9 @@ def list_contributors(format="html"):
     if format not in ["html", "bibtex", "citation"]:
         raise ValueError(f"Unsupported format: {format}")
 
-    with open(os.path.join(settings.data_path, "contributors")) as f:
-        people = yaml.load(f, Loader=yaml.FullLoader)
+    people = load_yaml_file(os.path.join(settings.data_path, "contributors"))
+    extras = additional_contributors(people)
     if format == "html":
-        included = []
         out = ""
         for info in people:
             if "img" in info:
@@ -77,7 +68,6 @@ def list_contributors(format="html"):
                 out += (f"<div class='social'><a href='https://github.com/{info['github']}'>"
                         "<i class='fa-brands fa-github' aria-hidden='true'></i>"
                         f"&nbsp;{info['github']}</a></div>")
-                included.append(info["github"])
             if "twitter" in info:
                 out += (f"<div class='social'><a href='https://twitter.com/{info['twitter']}'>"
                         "<i class='fa-brands fa-twitter' aria-hidden='true'></i>"
@@ -89,28 +79,15 @@ def list_contributors(format="html"):
                         f"&nbsp;@{handle}@{url}</a></div>")
             out += "<br style='clear:both' />"
 
-        if settings.github_token is None:
-            warnings.warn("Building without GitHub token. Skipping search for GitHub contributors.")
-        else:
-            g = Github(settings.github_token)
-            repo = g.get_repo("mscroggs/defelement.com")
-            pages = repo.get_contributors()
-            i = 0
-            extras = []
-            while True:
-                page = pages.get_page(i)
-                if len(page) == 0:
-                    break
-                for user in page:
-                    if user.login not in included:
-                        extras.append((user.login, user.name))
-                i += 1
-            if len(extras) > 0:
-                out += heading_with_self_ref("h2", "Additional contributors")
-                out += ("<p>The following people have contributed to DefElement but are yet to add "
-                        "details about themselves to this page:</p>\n<ul>\n")
-                for u in extras:
-                    out += "<li>"
+        if extras is not None and len(extras) > 0:
+            out += heading_with_self_ref("h2", "Additional contributors")
+            out += ("<p>The following people have contributed to DefElement but are yet to add "
+                    "details about themselves to this page:</p>\n<ul>\n")
+            for u in extras:
+                out += "<li>"
+                if u[0] is None:
+                    out += u[1]
+                else:
                     if u[1] is not None:
                         out += f"{u[1]} ("
                     out += (f"<a href='https://github.com/{u[0]}'>"
@@ -118,11 +95,11 @@ def list_contributors(format="html"):
                             f"&nbsp;{u[0]}</a>")
                     if u[1] is not None:
                         out += ")"
-                    out += "</li>\n"
-                out += "</ul>"
-                out += ("<p>If you're listed here, you can find instructions for how to add "
-                        "information about yourself on the [contributing page](contributing.md"
-                        "#Adding+yourself+to+the+contributors+list).</p>")
+                out += "</li>\n"
+            out += "</ul>"
+            out += ("<p>If you're listed here, you can find instructions for how to add "
+                    "information about yourself on the [contributing page](contributing.md"
+                    "#Adding+yourself+to+the+contributors+list).</p>")
 
         return out
     else:
@@ -131,30 +108,11 @@ def list_contributors(format="html"):
             names.append(info["name"])
         names.sort(key=lambda i: "AAA" if i.startswith("Scroggs") else i)
 
-        if settings.github_token is None:
-            warnings.warn(
-                "Building without GitHub token. Skipping search for GitHub contributors.")
-        else:
-            included = [info["github"] for info in people if "github" in info]
-            g = Github(settings.github_token)
-            repo = g.get_repo("mscroggs/defelement.com")
-            pages = repo.get_contributors()
-            i = 0
-            while True:
-                page = pages.get_page(i)
-                if len(page) == 0:
-                    break
-                for user in page:
-                    if user.login not in included:
-                        if format == "bibtex":
-                            names.append("others")
-                        else:
-                            names.append("et al")
-                        break
-                else:
-                    i += 1
-                    continue
-                break
+        if extras is not None and len(extras) > 0:
+            if format == "bibtex":
+                names.append("others")
+            else:
+                names.append("et al")
 
         return format_names(names, format)
 
@@ -180,7 +138,7 @@ def markup(content):
 
     content = preprocess(content)
 
-    out = ""
+    out = PageBuilder()
     popen = False
     ulopen = False
     liopen = False
@@ -203,7 +161,7 @@ def markup(content):
             while line.startswith("#"):
                 line = line[1:]
                 i += 1
-            out += heading_with_self_ref(f"h{i}", line.strip())
+            out.heading(f"h{i}", line.strip())
         elif line.startswith("* "):
             if popen:
                 out += "</p>\n"
@@ -260,7 +218,7 @@ def markup(content):
 
     page_references = []
 
-    out = out.replace("(CODE_OF_CONDUCT.md)", "(code-of-conduct.md)")
+    out = str(out).replace("(CODE_OF_CONDUCT.md)", "(code-of-conduct.md)")
 
     out = re.sub(r" *<ref ([^>]+)>", add_citation, out)
 
@@ -344,31 +302,46 @@ def author_info(matches):
 
 
 def plot_element(matches):
+    from . import plotting
+    from .symfem_cache import create_element, save_element
+
     if "variant=" in matches[1]:
         a, b = matches[1].split(" variant=")
-        e = symfem.create_element(a, matches[2], int(matches[3]), b)
+        e = create_element(a, matches[2], int(matches[3]), variant=b)
     else:
-        e = symfem.create_element(matches[1], matches[2], int(matches[3]))
-    return ("<center>"
-            f"{''.join([plotting.plot_function(e, i) for i in range(e.space_dim)])}"
-            "</center>")
+        e = create_element(matches[1], matches[2], int(matches[3]))
+    out = ("<center>"
+           f"{''.join([plotting.plot_function(e, i) for i in range(e.space_dim)])}"
+           "</center>")
+    save_element(e)
+    return out
 
 
 def plot_single_element(matches):
+    from . import plotting
+    from .symfem_cache import create_element, save_element
+
     if "variant=" in matches[1]:
         a, b = matches[1].split(" variant=")
-        e = symfem.create_element(a, matches[2], int(matches[3]), b)
+        e = create_element(a, matches[2], int(matches[3]), variant=b)
     else:
-        e = symfem.create_element(matches[1], matches[2], int(matches[3]))
-    return f"<center>{plotting.plot_function(e, int(matches[4]))}</center>"
+        e = create_element(matches[1], matches[2], int(matches[3]))
+    out = f"<center>{plotting.plot_function(e, int(matches[4]))}</center>"
+    save_element(e)
+    return out
 
 
 def plot_reference(matches):
+    import symfem
+    from . import plotting
+
     e = symfem.create_reference(matches[1])
     return f"<center>{plotting.plot_reference(e)}</center>"
 
 
 def plot_img(matches):
+    from . import plotting
+
     e = matches[1]
     return f"<center>{plotting.plot_img(e)}</center>"
 
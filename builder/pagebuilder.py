@@ -0,0 +1,66 @@
+from urllib.parse import quote_plus
+
+
+def heading_with_self_ref(hx, content):
+    id = quote_plus(content)
+    return f"<{hx} id=\"{id}\"><a href=\"#{id}\">{content}</a></{hx}>\n"
+
+
+class PageBuilder:
+    # Pages are built as a list of fragments that are joined once at the end, as repeatedly
+    # adding to a large string copies the whole string each time
+
+    def __init__(self, content=""):
+        self.parts = []
+        if content != "":
+            self.parts.append(content)
+
+    def __iadd__(self, fragment):
+        self.parts.append(str(fragment))
+        return self
+
+    def __str__(self):
+        return "".join(self.parts)
+
+    def __len__(self):
+        return sum(len(i) for i in self.parts)
+
+    def getvalue(self):
+        return str(self)
+
+    def add(self, *fragments):
+        self.parts += [str(i) for i in fragments]
+
+    def heading(self, hx, content):
+        self.parts.append(heading_with_self_ref(hx, content))
+
+    def table(self, rows, cls="element-info"):
+        self.parts.append(f"<table class='{cls}'>")
+        for row in rows:
+            self.parts.append("<tr>")
+            self.parts += [f"<td>{i}</td>" for i in row]
+            self.parts.append("</tr>")
+        self.parts.append("</table>")
+
+    def show_hide(self, name, show_text, hide_text, content, link_class=None):
+        # A link that shows a hidden block, and a link that hides it again
+        show_class = "" if link_class is None else f" class='show_{link_class}'"
+        hide_class = "" if link_class is None else f" class='hide_{link_class}'"
+        self.parts += [
+            f"<a{show_class} id='show_{name}_link' href='javascript:show_{name}()'"
+            f" style='display:block'>&darr; {show_text} &darr;</a>",
+            f"<a{hide_class} id='hide_{name}_link' href='javascript:hide_{name}()'"
+            f" style='display:none'>&uarr; {hide_text} &uarr;</a>",
+            f"<div id='{name}' style='display:none'>", str(content), "</div>",
+            "<script type='text/javascript'>\n",
+            f"function show_{name}(){{\n",
+            f"  document.getElementById('show_{name}_link').style.display = 'none'\n",
+            f"  document.getElementById('hide_{name}_link').style.display = 'block'\n",
+            f"  document.getElementById('{name}').style.display = 'block'\n",
+            "}\n",
+            f"function hide_{name}(){{\n",
+            f"  document.getElementById('show_{name}_link').style.display = 'block'\n",
+            f"  document.getElementById('hide_{name}_link').style.display = 'none'\n",
+            f"  document.getElementById('{name}').style.display = 'none'\n",
+            "}\n",
+            "</script>"]
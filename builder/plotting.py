@@ -1,9 +1,11 @@
 import os
+import shutil
 import sympy
 import typing
 from datetime import datetime
 from symfem.plotting import Picture, colors
-from . import settings
+from . import profiling, settings
+from .manifest import hash_data
 
 now = datetime.now()
 svg_desc = (
@@ -45,15 +47,119 @@ tex_comment = (
     "% https://creativecommons.org/licenses/by/4.0/\n"
     "% -------------------------------------------------------\n")
 
-all_plots = []
+all_plots = set()
+raster_pool = None
+raster_jobs = []
+
+
+def _plot_store():
+    return os.path.join(settings.html_path, ".plots")
+
+
+def reset_plot_store(remove=False):
+    all_plots.clear()
+    if os.path.isdir(_plot_store()):
+        shutil.rmtree(_plot_store())
+    if not remove:
+        os.mkdir(_plot_store())
+
+
+def source_tag(filename, source=None):
+    # Image pages end with a hash of the source of their plot. The plot is only reused by an
+    # incremental build if this is unchanged
+    return f"<!-- plot source {hash_data([filename, source])} -->\n"
+
+
+def plot_is_current(filename, source=None):
+    page_file = os.path.join(settings.htmlimg_path, f"{filename}.html")
+    if not os.path.isfile(page_file):
+        return False
+    with open(page_file) as f:
+        return f.read().endswith(source_tag(filename, source))
+
+
+def claim_plot(filename, source=None):
+    # Each plot is claimed by exactly one process per build by atomically creating a file in
+    # the plot store. The set of plots claimed by this process avoids touching the disk again
+    if filename in all_plots:
+        return False
+    all_plots.add(filename)
+    if settings.incremental and plot_is_current(filename, source):
+        return False
+    try:
+        fd = os.open(os.path.join(_plot_store(), filename), os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+    except FileExistsError:
+        return False
+    os.close(fd)
+    return True
+
+
+def capture_picture(plot: typing.Callable, args: typing.List[typing.Any], **kwargs: typing.Any):
+    # Run the plotting function once and keep the picture it creates instead of saving it, so
+    # that every output format can be made from the same picture
+    pictures = []
+    save = Picture.save
+    Picture.save = lambda self, filename, plot_options={}: pictures.append(self)
+    try:
+        plot(*args, "picture.svg", **kwargs)
+    finally:
+        Picture.save = save
+    assert len(pictures) == 1
+    return pictures[0]
+
+
+def _rasterize(svg: str, pngs: typing.List[typing.Tuple[str, float]], page_file: str, page: str):
+    from cairosvg import svg2png
+
+    for png_file, png_scale in pngs:
+        svg2png(bytestring=svg.encode(), write_to=png_file, scale=png_scale)
+    # The image page is written last as it marks that the plot is complete
+    with open(page_file, "w") as f:
+        f.write(page)
+
+
+def _raster_pool():
+    # Each process starts one pool of raster processes and uses it for every page that it
+    # makes, until close_raster_pool is called
+    global raster_pool
+    if raster_pool is None or raster_pool[0] != os.getpid():
+        from concurrent.futures import ProcessPoolExecutor
+
+        raster_pool = (os.getpid(), ProcessPoolExecutor(settings.raster_processes))
+    return raster_pool[1]
+
+
+def rasterize(svg: str, pngs: typing.List[typing.Tuple[str, float]], page_file: str, page: str):
+    if settings.raster_processes == 0:
+        _rasterize(svg, pngs, page_file, page)
+    else:
+        raster_jobs.append(_raster_pool().submit(_rasterize, svg, pngs, page_file, page))
+
+
+def finish_plots():
+    # Wait for the plots submitted by this process to be rasterized
+    try:
+        for job in raster_jobs:
+            job.result()
+    finally:
+        raster_jobs.clear()
+
+
+def close_raster_pool():
+    # This must be called before forking, so that the pool's threads and processes are not
+    # inherited by the new processes, and before a process that has used the pool exits
+    global raster_pool
+    if raster_pool is not None and raster_pool[0] == os.getpid():
+        finish_plots()
+        raster_pool[1].shutdown()
+        raster_pool = None
 
 
 def do_the_plot(
     filename: str, desc: str, plot: typing.Callable,
     args: typing.List[typing.Any] = [], png_width: int = 180,
-    scale: int = 250, link: bool = True
+    scale: int = 250, link: bool = True, source: typing.Optional[str] = None
 ) -> str:
-    global all_plots
     from .html import make_html_page
     from .markup import cap_first, heading_with_self_ref
 
@@ -64,13 +170,16 @@ def do_the_plot(
         "svg_metadata": svg_metadata.replace("{title}", desc), "tex_comment": tex_comment}
     svg_kw = {"scale": scale, "dof_arrow_size": sympy.Rational(3, 2)}
 
-    if filename not in all_plots:
-        plot(*args, os.path.join(settings.htmlimg_path, f"{filename}.tex"), **kwargs)
-        plot(*args, os.path.join(settings.htmlimg_path, f"{filename}.svg"), **svg_kw, **kwargs)
-        plot(*args, os.path.join(settings.htmlimg_path, f"{filename}.png"),
-             plot_options={"png_width": png_width}, **svg_kw, **kwargs)
-        plot(*args, os.path.join(settings.htmlimg_path, f"{filename}-large.png"),
-             plot_options={"png_width": png_width * 9 // 2}, **svg_kw, **kwargs)
+    if claim_plot(filename, source):
+        with profiling.timer("plots", filename):
+            picture = capture_picture(plot, args, **svg_kw, **kwargs)
+
+        # The TikZ output uses symfem's default scale
+        picture.scale = None
+        picture.as_tikz(os.path.join(settings.htmlimg_path, f"{filename}.tex"))
+        picture.scale = scale
+        svg = picture.as_svg(os.path.join(settings.htmlimg_path, f"{filename}.svg"))
+        svg_width = float(picture.compute_scale("px")[2])
 
         img_page = heading_with_self_ref("h1", cap_first(desc))
         img_page += f"<center><a href='/img/{filename}-large.png'>"
@@ -91,9 +200,12 @@ def do_the_plot(
         img_page += f"<li><a href='/img/{filename}.tex'>Download TikZ</a></li>"
         img_page += "</ul>"
 
-        with open(os.path.join(settings.htmlimg_path, f"{filename}.html"), "w") as f:
-            f.write(make_html_page(img_page))
-        all_plots.append(filename)
+        rasterize(svg, [
+            (os.path.join(settings.htmlimg_path, f"{filename}.png"), png_width / svg_width),
+            (os.path.join(settings.htmlimg_path, f"{filename}-large.png"),
+             png_width * 9 // 2 / svg_width),
+        ], os.path.join(settings.htmlimg_path, f"{filename}.html"),
+            make_html_page(img_page) + source_tag(filename, source))
 
     if link:
         return f"<a href='/img/{filename}.html'><img src='/img/{filename}.png'></a>"
@@ -153,6 +265,8 @@ def _parse_point(points, n):
 def plot_img(img_filename: str, link: bool = True):
     metadata = {"DESC": ""}
     filename = f"img-{img_filename}"
+    with open(os.path.join(settings.img_path, f"{img_filename}.img")) as f:
+        source = f.read()
     with open(os.path.join(settings.img_path, f"{img_filename}.img")) as f:
         for line in f:
             if ":" in f:
@@ -183,7 +297,7 @@ def plot_img(img_filename: str, link: bool = True):
                         img.add_line(p1, p2, color=color, width=2)
         img.save(filename, plot_options)
 
-    return do_the_plot(filename, desc, actual_plot, link=link)
+    return do_the_plot(filename, desc, actual_plot, link=link, source=source)
 
 
 def plot_dof_diagram(element, link: bool = True):
@@ -1,9 +1,9 @@
 import re
 import os
-import yaml
+from .catalogue import load_yaml_file
 
-with open(os.path.join(os.path.dirname(os.path.realpath(__file__)), "../data/polysets")) as f:
-    poly_sets = yaml.load(f, Loader=yaml.FullLoader)
+poly_sets = load_yaml_file(
+    os.path.join(os.path.dirname(os.path.realpath(__file__)), "../data/polysets"))
 
 named = {}
 defs = {}
@@ -0,0 +1,114 @@
+import cProfile
+import json
+import os
+import pstats
+import time
+from contextlib import contextmanager
+from . import settings
+
+phases = []
+records = {}
+current_phase = None
+
+
+def _cpu_time():
+    # This includes the time used by worker processes that have finished
+    t = os.times()
+    return t.user + t.system + t.children_user + t.children_system
+
+
+def start_phase(name):
+    global current_phase
+    end_phase()
+    profiler = None
+    if name in settings.cprofile_phases:
+        profiler = cProfile.Profile()
+        profiler.enable()
+    current_phase = (name, time.perf_counter(), _cpu_time(), profiler)
+
+
+def end_phase():
+    global current_phase
+    if current_phase is None:
+        return
+    name, wall, cpu, profiler = current_phase
+    phases.append({
+        "name": name, "wall": time.perf_counter() - wall, "cpu": _cpu_time() - cpu})
+    if profiler is not None:
+        profiler.disable()
+        os.makedirs(settings.html_path, exist_ok=True)
+        profiler.dump_stats(os.path.join(settings.html_path, f"profile-{name}.prof"))
+        print(f"cProfile of {name}:")
+        pstats.Stats(profiler).sort_stats("cumulative").print_stats(20)
+    current_phase = None
+
+
+def record(kind, key, wall, cpu=None):
+    if kind not in records:
+        records[kind] = {}
+    records[kind][key] = {"wall": wall, "cpu": cpu}
+
+
+@contextmanager
+def timer(kind, key):
+    wall = time.perf_counter()
+    cpu = time.process_time()
+    try:
+        yield
+    finally:
+        record(kind, key, time.perf_counter() - wall, time.process_time() - cpu)
+
+
+def collect():
+    # Take the records made in a worker process so that they can be sent to the main process
+    out = {kind: dict(r) for kind, r in records.items()}
+    records.clear()
+    return out
+
+
+def merge(new_records):
+    for kind, r in new_records.items():
+        if kind not in records:
+            records[kind] = {}
+        records[kind].update(r)
+
+
+def report():
+    return {
+        "phases": phases,
+        "total": {"wall": sum(p["wall"] for p in phases), "cpu": sum(p["cpu"] for p in phases)},
+        **{kind: dict(sorted(r.items(), key=lambda i: -i[1]["wall"]))
+           for kind, r in records.items()}}
+
+
+def _format_time(t):
+    if t is None:
+        return ""
+    return f"{t:.2f}s"
+
+
+def write_report(html=False):
+    from .html import write_html_file
+    from .markup import heading_with_self_ref
+
+    data = report()
+    with open(os.path.join(settings.html_path, "profile.json"), "w") as f:
+        json.dump(data, f)
+
+    if html:
+        content = heading_with_self_ref("h1", "Build profile")
+        content += "<table class='bordered align-left'>"
+        content += "<thead><tr><td>Phase</td><td>Wall time</td><td>CPU time</td></tr></thead>"
+        for p in data["phases"] + [{"name": "<b>Total</b>", **data["total"]}]:
+            content += (f"<tr><td>{p['name']}</td><td>{_format_time(p['wall'])}</td>"
+                        f"<td>{_format_time(p['cpu'])}</td></tr>")
+        content += "</table>"
+        for kind in records:
+            content += heading_with_self_ref("h2", f"Slowest {kind}")
+            content += "<table class='bordered align-left'>"
+            content += "<thead><tr><td>Name</td><td>Wall time</td><td>CPU time</td></tr></thead>"
+            for key, t in list(data[kind].items())[:50]:
+                content += (f"<tr><td>{key}</td><td>{_format_time(t['wall'])}</td>"
+                            f"<td>{_format_time(t['cpu'])}</td></tr>")
+            content += "</table>"
+        write_html_file(os.path.join(settings.html_path, "profile.html"), content, "Build profile")
@@ -0,0 +1,110 @@
+import argparse
+from .snapshot import load_categoriser
+
+# Fields that elements can be searched by. Each field maps to a function that returns the keys
+# an element is listed under in the index for that field
+fields = {
+    "reference": lambda e: e.reference_elements(False),
+    "category": lambda e: e.data["categories"] if "categories" in e.data else [],
+    "sobolev": lambda e: _values(e.sobolev()),
+    "mapping": lambda e: _values(e.mapping()),
+    "implementation": lambda e: e.data["implementations"] if "implementations" in e.data else {},
+    "family": lambda e: [i.split(",")[0] for j in e.complexes(False, False).values() for i in j],
+    "ndofs": lambda e: _formulas(e.data["ndofs"]) if "ndofs" in e.data else [],
+}
+
+
+def _values(value):
+    if value is None:
+        return []
+    if isinstance(value, dict):
+        return list(value.values())
+    return [value]
+
+
+def _normalise_formula(formula):
+    return "".join(f"{formula}".split())
+
+
+def _formulas(ndofs):
+    out = []
+    for cell_ndofs in ndofs.values():
+        if "formula" in cell_ndofs:
+            formula = cell_ndofs["formula"]
+            if isinstance(formula, list):
+                out += [_normalise_formula(f) for case in formula for f in case.values()]
+            else:
+                out.append(_normalise_formula(formula))
+    return out
+
+
+class Query:
+    def __init__(self, categoriser):
+        self.categoriser = categoriser
+        self.indexes = {field: {} for field in fields}
+        for e in categoriser.elements:
+            for field, keys in fields.items():
+                for key in set(keys(e)):
+                    if key not in self.indexes[field]:
+                        self.indexes[field][key] = []
+                    self.indexes[field][key].append(e)
+
+    def keys(self, field):
+        if field not in self.indexes:
+            raise ValueError(f"Unknown field: {field}")
+        return sorted(self.indexes[field])
+
+    def matching(self, field, values):
+        # Elements that are listed under any of the values in the index for a field
+        if field not in self.indexes:
+            raise ValueError(f"Unknown field: {field}")
+        if isinstance(values, str):
+            values = [values]
+        if field == "ndofs":
+            values = [_normalise_formula(v) for v in values]
+        return set(e.filename for v in values for e in self.indexes[field].get(v, []))
+
+    def select(self, **filters):
+        # Elements that match all of the filters. Each filter can be a single value or a list
+        # of values, any of which can be matched
+        out = self.categoriser.elements
+        for field, values in filters.items():
+            if values is not None:
+                found = self.matching(field, values)
+                out = [e for e in out if e.filename in found]
+        return list(out)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Search the DefElement catalogue")
+    parser.add_argument('--ref', metavar="ref", action="append", default=None,
+                        help="Reference cell.")
+    parser.add_argument('--category', metavar="category", action="append", default=None,
+                        help="Category.")
+    parser.add_argument('--sobolev', metavar="sobolev", action="append", default=None,
+                        help="Sobolev space.")
+    parser.add_argument('--mapping', metavar="mapping", action="append", default=None,
+                        help="Mapping.")
+    parser.add_argument('--impl', metavar="impl", action="append", default=None,
+                        help="Library that implements the element.")
+    parser.add_argument('--family', metavar="family", action="append", default=None,
+                        help="Family in a complex, eg P or Q-.")
+    parser.add_argument('--ndofs', metavar="ndofs", action="append", default=None,
+                        help="Formula for the number of DOFs, eg (k+1)(k+2)/2.")
+    parser.add_argument('--list', metavar="list", default=None, choices=list(fields),
+                        help="List the values that can be searched for in a field.")
+    parser.add_argument('--filenames', action="store_true",
+                        help="Only output the filenames of the elements found.")
+    args = parser.parse_args()
+
+    query = Query(load_categoriser(timestamps=False))
+    if args.list is not None:
+        for key in query.keys(args.list):
+            print(key)
+    else:
+        for e in query.select(
+            reference=args.ref, category=args.category, sobolev=args.sobolev,
+            mapping=args.mapping, implementation=args.impl, family=args.family,
+            ndofs=args.ndofs,
+        ):
+            print(e.filename if args.filenames else f"{e.filename}: {e.name}")
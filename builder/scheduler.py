@@ -0,0 +1,161 @@
+import json
+import os
+import queue
+import time
+import traceback
+from datetime import datetime
+from . import profiling, settings
+
+cell_dims = {
+    "point": 0, "interval": 1, "triangle": 2, "quadrilateral": 2, "dual polygon": 2,
+    "tetrahedron": 3, "hexahedron": 3, "prism": 3, "pyramid": 3}
+
+
+class TasksFailed(RuntimeError):
+    # The results of the tasks that finished are kept, with None for the tasks that did not
+    def __init__(self, message, results):
+        super().__init__(message)
+        self.results = results
+
+
+def heuristic_cost(cell, order):
+    # Symbolic computations scale roughly with the number of basis functions squared
+    dim = cell_dims[cell.split("(")[0]]
+    return float((order + 1) ** (2 * dim))
+
+
+def _timings_file(name):
+    return os.path.join(settings.cache_path, f"{name}-timings.json")
+
+
+def load_timings(name):
+    if os.path.isfile(_timings_file(name)):
+        with open(_timings_file(name)) as f:
+            return json.load(f)
+    return {}
+
+
+def save_timings(name, timings):
+    os.makedirs(settings.cache_path, exist_ok=True)
+    with open(_timings_file(name), "w") as f:
+        json.dump(timings, f)
+
+
+def order_tasks(name, keys, costs):
+    # Order tasks longest first, using the durations recorded on the previous run when they
+    # are available. Heuristic costs are rescaled to be comparable to recorded durations
+    timings = load_timings(name)
+    known = [(timings[k], c) for k, c in zip(keys, costs) if k in timings]
+    scale = 1.0
+    if len(known) > 0 and sum(c for _, c in known) > 0:
+        scale = sum(t for t, _ in known) / sum(c for _, c in known)
+    expected = [timings[k] if k in timings else c * scale for k, c in zip(keys, costs)]
+    return sorted(range(len(keys)), key=lambda i: -expected[i])
+
+
+def _worker(target, tasks, task_queue, result_queue, n, cleanup):
+    while True:
+        i = task_queue.get()
+        if i is None:
+            break
+        start = datetime.now()
+        cpu = time.process_time()
+        result = None
+        try:
+            result = target(tasks[i], f"[{n}] ")
+            error = None
+        except BaseException:
+            error = traceback.format_exc()
+        result_queue.put((
+            i, n, (datetime.now() - start).total_seconds(), time.process_time() - cpu, error,
+            result, profiling.collect()))
+    if cleanup is not None:
+        cleanup()
+
+
+def run_tasks(name, target, tasks, keys, costs, processes=None, cleanup=None):
+    # If cleanup is given, it is called by each worker process after its last task
+    if processes is None:
+        processes = settings.processes
+    if len(tasks) == 0:
+        return []
+    order = order_tasks(name, keys, costs)
+    timings = load_timings(name)
+    results = [None for _ in tasks]
+    busy = [0.0 for _ in range(processes)]
+    counts = [0 for _ in range(processes)]
+    errors = []
+
+    start = datetime.now()
+    if processes == 1:
+        for i in order:
+            task_start = datetime.now()
+            cpu = time.process_time()
+            # A failed task is recorded and the remaining tasks are still run, as they are
+            # by the worker processes
+            error = None
+            try:
+                results[i] = target(tasks[i], "")
+            except Exception:
+                error = traceback.format_exc()
+            duration = (datetime.now() - task_start).total_seconds()
+            profiling.record(name, keys[i], duration, time.process_time() - cpu)
+            busy[0] += duration
+            counts[0] += 1
+            if error is None:
+                timings[keys[i]] = duration
+            else:
+                errors.append(error)
+    else:
+        import multiprocessing
+
+        task_queue = multiprocessing.Queue()
+        result_queue = multiprocessing.Queue()
+        for i in order:
+            task_queue.put(i)
+        for _ in range(processes):
+            task_queue.put(None)
+
+        jobs = [
+            multiprocessing.Process(
+                target=_worker, args=(target, tasks, task_queue, result_queue, n, cleanup))
+            for n in range(processes)]
+        for j in jobs:
+            j.start()
+
+        received = 0
+        while received < len(tasks):
+            try:
+                i, n, duration, cpu, error, result, records = result_queue.get(timeout=1)
+            except queue.Empty:
+                if all(not j.is_alive() for j in jobs) and result_queue.empty():
+                    break
+                continue
+            received += 1
+            profiling.record(name, keys[i], duration, cpu)
+            profiling.merge(records)
+            busy[n] += duration
+            counts[n] += 1
+            if error is None:
+                timings[keys[i]] = duration
+                results[i] = result
+            else:
+                errors.append(error)
+
+        for j in jobs:
+            j.join()
+
+    wall = (datetime.now() - start).total_seconds()
+    save_timings(name, timings)
+
+    if processes > 1 and wall > 0:
+        print(f"Worker utilisation ({name}, {wall:.2f}s total):")
+        for n in range(processes):
+            print(f"  [{n}] {counts[n]} tasks, {busy[n]:.2f}s busy ({100 * busy[n] / wall:.1f}%)")
+        print(f"  overall {100 * sum(busy) / (processes * wall):.1f}%")
+
+    if len(errors) > 0:
+        raise TasksFailed(f"{len(errors)} task(s) failed:\n" + "\n".join(errors), results)
+    if sum(counts) < len(tasks):
+        raise TasksFailed(f"{len(tasks) - sum(counts)} task(s) were not run", results)
+    return results
@@ -0,0 +1,258 @@
+import os
+import re
+from . import settings
+from .catalogue import load_definitions, load_yaml_file
+from .formulas import FormulaError, compile_formula
+from .implementations import parse_example
+
+# Each validator takes a value and the path to it, and returns a list of errors
+
+
+def _child(path, key):
+    return key if path == "" else f"{path}.{key}"
+
+
+def _error(path, message):
+    return message if path == "" else f"{path}: {message}"
+
+
+def _is(*types, choices=None):
+    names = " or ".join(t.__name__ for t in types)
+
+    def validate(value, path):
+        if not isinstance(value, types) or isinstance(value, bool):
+            return [_error(path, f"expected {names}, got {type(value).__name__}")]
+        if choices is not None and value not in choices():
+            return [_error(path, f"unknown value {value!r}")]
+        return []
+
+    return validate
+
+
+def _matches(pattern, description):
+    compiled = re.compile(pattern)
+
+    def validate(value, path):
+        if not isinstance(value, str):
+            return [_error(path, f"expected str, got {type(value).__name__}")]
+        if not compiled.match(value):
+            return [_error(path, f"{value!r} is not {description}")]
+        return []
+
+    return validate
+
+
+def _list_of(item):
+    def validate(value, path):
+        if not isinstance(value, list):
+            return [_error(path, f"expected list, got {type(value).__name__}")]
+        return [e for i, v in enumerate(value) for e in item(v, f"{path}[{i}]")]
+
+    return validate
+
+
+def _dict_of(item, keys=None):
+    def validate(value, path):
+        if not isinstance(value, dict):
+            return [_error(path, f"expected dict, got {type(value).__name__}")]
+        errors = []
+        for k, v in value.items():
+            if keys is not None and not keys(k):
+                errors.append(_error(path, f"unknown key {k!r}"))
+            else:
+                errors += item(v, _child(path, k))
+        return errors
+
+    return validate
+
+
+def _record(required, optional={}):
+    def validate(value, path):
+        if not isinstance(value, dict):
+            return [_error(path, f"expected dict, got {type(value).__name__}")]
+        errors = [_error(path, f"missing key {k!r}") for k in required if k not in value]
+        for k, v in value.items():
+            if k in required:
+                errors += required[k](v, _child(path, k))
+            elif k in optional:
+                errors += optional[k](v, _child(path, k))
+            else:
+                errors.append(_error(path, f"unknown key {k!r}"))
+        return errors
+
+    return validate
+
+
+def _any_of(*validators):
+    def validate(value, path):
+        results = [v(value, path) for v in validators]
+        for r in results:
+            if len(r) == 0:
+                return []
+        return min(results, key=len)
+
+    return validate
+
+
+def _data_lines(name):
+    with open(os.path.join(settings.data_path, name)) as f:
+        return [line.split(":")[0].strip() for line in f if line.strip() != ""]
+
+
+_data = {}
+
+
+def _data_file(name, loader):
+    if name not in _data:
+        _data[name] = loader(name)
+    return _data[name]
+
+
+def references():
+    return _data_file("references", _data_lines)
+
+
+def categories():
+    return _data_file("categories", _data_lines)
+
+
+def implementations():
+    return _data_file(
+        "implementations", lambda name: load_yaml_file(os.path.join(settings.data_path, name)))
+
+
+def families():
+    return _data_file(
+        "families", lambda name: load_yaml_file(os.path.join(settings.data_path, name)))
+
+
+def _is_cell(name):
+    # Cells can be parametrised, eg dual polygon(n)
+    return name.split("(")[0] in references()
+
+
+def _is_entity(name):
+    return name in entities
+
+
+mappings = [
+    "identity", "covariant Piola", "contravariant Piola", "double covariant Piola",
+    "double contravariant Piola"]
+sobolev_spaces = ["L2", "H1", "H2", "H3", "H(div)", "H(curl)", "H(div div)", "H(curl curl)"]
+entities = ["vertices", "edges", "faces", "volumes", "ridges", "peaks", "facets", "cell"]
+entity_types = ["vertices", "edges", "faces", "volumes"]
+
+_string = _is(str)
+_strings = _list_of(_string)
+_order = _is(int)
+
+
+def _formula(value, path):
+    try:
+        compile_formula(value)
+    except FormulaError as e:
+        return [_error(path, str(e))]
+    return []
+
+
+_dof_count = _record({"formula": _formula},
+                     {"oeis": _matches(r"^A[0-9]{6}$", "an OEIS A-number")})
+_mixed = _matches(r"^[^()]+\([^()]+\)$", "an element and order in the form element(order)")
+_reference = _is(str, choices=references)
+_variant = _record({"description": _string, "variant-name": _string},
+                   {"names": _strings, "short-names": _strings})
+_per_cell_order = _any_of(_order, _dict_of(_order, keys=_is_cell))
+_dofs_on_entity = _any_of(_string, _strings, _dict_of(_any_of(_string, _strings)))
+_dofs = _dict_of(_any_of(_dofs_on_entity, _dict_of(_dofs_on_entity, keys=_is_entity)),
+                 keys=lambda k: _is_entity(k) or _is_cell(k))
+_implementation = _any_of(_string, _dict_of(_any_of(_string, _dict_of(_string))))
+
+_required = {
+    "name": _string,
+    "html-name": _string,
+    "reference-elements": _list_of(_reference),
+}
+_optional = {
+    "alt-names": _strings,
+    "short-names": _strings,
+    "variants": _dict_of(_variant),
+    "complexes": _dict_of(_any_of(_string, _strings), keys=lambda k: k in families()),
+    "dofs": _dofs,
+    "ndofs": _dict_of(_dof_count, keys=_is_cell),
+    "entity-ndofs": _dict_of(_any_of(_dof_count, _dict_of(_dof_count, keys=_is_cell)),
+                             keys=lambda k: k in entity_types),
+    "polynomial-set": _dict_of(_string),
+    "mixed": _list_of(_mixed),
+    "mapping": _is(str, choices=lambda: mappings),
+    "sobolev": _any_of(_is(str, choices=lambda: sobolev_spaces),
+                       _dict_of(_is(str, choices=lambda: sobolev_spaces))),
+    "min-order": _per_cell_order,
+    "max-order": _per_cell_order,
+    "examples": _strings,
+    "notes": _strings,
+    "references": _list_of(_dict_of(_any_of(_string, _strings, _is(int, float)))),
+    "categories": _list_of(_is(str, choices=categories)),
+    "implementations": _dict_of(_implementation, keys=lambda k: k in implementations()),
+}
+schema = _record(_required, _optional)
+schema_keys = {"required": list(_required), "optional": list(_optional)}
+
+
+def check_element(fname, data, filenames):
+    # Checks that need to compare different parts of an element's data, or other elements
+    errors = []
+    if not isinstance(data, dict) or "reference-elements" not in data:
+        return errors
+    cells = data["reference-elements"]
+    variants = data["variants"] if "variants" in data else {}
+
+    for i, e in enumerate(data["examples"] if "examples" in data else []):
+        try:
+            cell, order, variant, kwargs = parse_example(e)
+        except ValueError:
+            errors.append(f"examples[{i}]: {e!r} is not in the form cell,order[,variant] [{{...}}]")
+            continue
+        if cell.split("(")[0] not in cells:
+            errors.append(f"examples[{i}]: {cell} is not a reference element of this element")
+        if variant is not None and variant not in variants:
+            errors.append(f"examples[{i}]: unknown variant {variant!r}")
+
+    for i, e in enumerate(data["mixed"] if "mixed" in data else []):
+        if e.split("(")[0] not in filenames:
+            errors.append(f"mixed[{i}]: unknown element {e.split('(')[0]!r}")
+
+    for key, entries in (data["complexes"] if "complexes" in data else {}).items():
+        if key not in families():
+            continue
+        for e in entries if isinstance(entries, list) else [entries]:
+            if len(e.split(",")) not in [3, 4]:
+                errors.append(f"complexes.{key}: {e!r} is not in the form family,ext,cell[,k]")
+            elif e.split(",")[0] not in families()[key]:
+                errors.append(f"complexes.{key}: unknown family {e.split(',')[0]!r}")
+
+    for lib, imp in (data["implementations"] if "implementations" in data else {}).items():
+        if isinstance(imp, dict):
+            for k in imp:
+                if k != "display" and k not in cells and k not in variants:
+                    errors.append(f"implementations.{lib}: {k!r} is not a reference element or "
+                                  "variant of this element")
+    return errors
+
+
+def validate_element(fname, data, filenames=None):
+    if filenames is None:
+        filenames = [fname]
+    return [f"{fname}.def: {e}" for e in schema(data, "") + check_element(fname, data, filenames)]
+
+
+def validate_catalogue(folder=None):
+    definitions = load_definitions(folder)
+    return [e for fname, data in definitions.items()
+            for e in validate_element(fname, data, list(definitions))]
+
+
+def check_catalogue(folder=None):
+    errors = validate_catalogue(folder)
+    if len(errors) > 0:
+        raise ValueError(f"{len(errors)} error(s) found in element definitions:\n"
+                         + "\n".join(errors))
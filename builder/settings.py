@@ -15,7 +15,23 @@ htmlindices_path = _os.path.join(html_path, "lists")
 htmlfamilies_path = _os.path.join(html_path, "families")
 
 verification_json = _os.path.join(dir_path, "verification.json")
+verification_timeout = None
+verification_timeouts = {}
+verification_memory_limit = None
 
 github_token = None
+contributors_source = None
+contributors_ttl = 24 * 60 * 60
 
 processes = 1
+raster_processes = 0
+load_processes = 0
+
+cache_path = _os.path.join(dir_path, ".cache")
+use_cache = True
+
+incremental = False
+
+profile = False
+profile_html = False
+cprofile_phases = []
@@ -0,0 +1,97 @@
+import hashlib
+import os
+import pickle
+from . import settings
+from .element import Categoriser
+from .timestamps import element_timestamps
+
+# A fully loaded Categoriser is stored in .cache/categoriser.pickle so that build.py, verify.py
+# and their worker processes do not each need to load the data files and every .def file. The
+# snapshot is remade when any of the files it was made from change
+_categoriser = None
+data_files = ["categories", "references", "families", "implementations"]
+
+
+def _snapshot_file():
+    return os.path.join(settings.cache_path, "categoriser.pickle")
+
+
+_file_hashes = {}
+
+
+def _file_hash(path):
+    # Files are only read again if their modification time or size has changed since they
+    # were last hashed in this process
+    stat = os.stat(path)
+    stat = (stat.st_mtime_ns, stat.st_size)
+    if path not in _file_hashes or _file_hashes[path][0] != stat:
+        with open(path, "rb") as f:
+            _file_hashes[path] = (stat, hashlib.sha256(f.read()).hexdigest())
+    return _file_hashes[path][1]
+
+
+def _inputs_hash(folder):
+    h = hashlib.sha256()
+    paths = [os.path.join(settings.data_path, i) for i in data_files]
+    paths += [os.path.join(folder, i) for i in sorted(os.listdir(folder))
+              if i.endswith(".def") and not i.startswith(".")]
+    # Changes to these files can change the contents or layout of the pickled objects
+    paths += [os.path.join(settings.dir_path, "builder", i)
+              for i in ["catalogue.py", "element.py", "formulas.py", "snapshot.py"]]
+    for path in paths:
+        h.update(path.encode())
+        h.update(_file_hash(path).encode())
+    return h.hexdigest()
+
+
+def make_categoriser(folder):
+    categoriser = Categoriser()
+    categoriser.load_categories(os.path.join(settings.data_path, "categories"))
+    categoriser.load_references(os.path.join(settings.data_path, "references"))
+    categoriser.load_families(os.path.join(settings.data_path, "families"))
+    categoriser.load_implementations(os.path.join(settings.data_path, "implementations"))
+    categoriser.load_folder(folder, timestamps=False)
+    return categoriser
+
+
+def _load_snapshot(key):
+    if settings.use_cache and os.path.isfile(_snapshot_file()):
+        try:
+            with open(_snapshot_file(), "rb") as f:
+                snapshot = pickle.load(f)
+            if snapshot["key"] == key:
+                return snapshot["categoriser"]
+        except (EOFError, pickle.UnpicklingError, AttributeError, ImportError):
+            pass
+    return None
+
+
+def _save_snapshot(key, categoriser):
+    if not settings.use_cache:
+        return
+    os.makedirs(settings.cache_path, exist_ok=True)
+    with open(f"{_snapshot_file()}.{os.getpid()}", "wb") as f:
+        pickle.dump({"key": key, "categoriser": categoriser}, f, pickle.HIGHEST_PROTOCOL)
+    os.replace(f"{_snapshot_file()}.{os.getpid()}", _snapshot_file())
+
+
+def load_categoriser(folder=None, timestamps=True):
+    # Returns the Categoriser for the elements in the folder. Within a process (and in worker
+    # processes started by forking it) the same Categoriser is returned every time
+    global _categoriser
+    if folder is None:
+        folder = settings.element_path
+    key = (os.path.realpath(folder), _inputs_hash(folder))
+    if _categoriser is None or _categoriser[0] != key:
+        categoriser = _load_snapshot(key)
+        if categoriser is None:
+            categoriser = make_categoriser(folder)
+            _save_snapshot(key, categoriser)
+        _categoriser = (key, categoriser)
+    categoriser = _categoriser[1]
+
+    if timestamps and categoriser.elements[0].created is None:
+        times = element_timestamps(folder, [e.filename for e in categoriser.elements])
+        for e in categoriser.elements:
+            e.created, e.modified = times[e.filename]
+    return categoriser
@@ -0,0 +1,74 @@
+import numpy as np
+import os
+import pickle
+import symfem
+from .manifest import hash_data
+from . import settings
+
+
+def element_key(cell, element_type, order, **kwargs):
+    return hash_data([cell, element_type, order, kwargs, symfem.__version__])
+
+
+def _element_file(key):
+    return os.path.join(settings.cache_path, "elements", f"{key}.pickle")
+
+
+def create_element(cell, element_type, order, **kwargs):
+    key = element_key(cell, element_type, order, **kwargs)
+    if settings.use_cache and os.path.isfile(_element_file(key)):
+        try:
+            with open(_element_file(key), "rb") as f:
+                element = pickle.load(f)
+            element._defelement_cache_key = key
+            element._defelement_unsaved = False
+            return element
+        except (EOFError, pickle.UnpicklingError, AttributeError, ImportError):
+            pass
+
+    element = symfem.create_element(cell, element_type, order, **kwargs)
+    element._defelement_cache_key = key
+    element._defelement_unsaved = True
+    save_element(element)
+    return element
+
+
+def save_element(element):
+    # Elements that were not in the cache are saved again after their basis functions have
+    # been computed so that later builds do not need to recompute them. Elements loaded from
+    # the cache are not saved again
+    if not settings.use_cache or not getattr(element, "_defelement_unsaved", False):
+        return
+    file = _element_file(element._defelement_cache_key)
+    os.makedirs(os.path.dirname(file), exist_ok=True)
+    with open(f"{file}.{os.getpid()}", "wb") as f:
+        pickle.dump(element, f)
+    os.replace(f"{file}.{os.getpid()}", file)
+
+
+def table_key(cell, element_type, order, points, **kwargs):
+    return hash_data([cell, element_type, order, kwargs, symfem.__version__, points.tolist()])
+
+
+def _table_file(key):
+    return os.path.join(settings.cache_path, "tables", f"{key}.npy")
+
+
+def load_table(key):
+    # Tables are memory-mapped, so are only read from disk when they are used
+    if settings.use_cache and os.path.isfile(_table_file(key)):
+        try:
+            return np.load(_table_file(key), mmap_mode="r")
+        except (ValueError, OSError):
+            pass
+    return None
+
+
+def save_table(key, table):
+    if not settings.use_cache:
+        return
+    file = _table_file(key)
+    os.makedirs(os.path.dirname(file), exist_ok=True)
+    with open(f"{file}.{os.getpid()}", "wb") as f:
+        np.save(f, table)
+    os.replace(f"{file}.{os.getpid()}", file)
@@ -0,0 +1,92 @@
+import json
+import os
+import subprocess
+import warnings
+from datetime import datetime, timezone
+from . import settings
+
+
+def _git(*args):
+    return subprocess.run(
+        ["git", *args], cwd=settings.dir_path, capture_output=True, text=True, check=True
+    ).stdout.strip()
+
+
+def _timestamps_file():
+    return os.path.join(settings.cache_path, "timestamps.json")
+
+
+def git_timestamps(folder):
+    # Get the times of the first and last commits that changed each file in the folder from a
+    # single pass over the local git history. Returns None if the full history is not available
+    try:
+        if _git("rev-parse", "--is-shallow-repository") == "true":
+            return None
+        head = _git("rev-parse", "HEAD")
+        root = _git("rev-parse", "--show-toplevel")
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    folder = os.path.relpath(os.path.realpath(folder), os.path.realpath(root))
+
+    if settings.use_cache and os.path.isfile(_timestamps_file()):
+        with open(_timestamps_file()) as f:
+            cached = json.load(f)
+        if cached["head"] == head and cached["folder"] == folder:
+            return cached["timestamps"]
+
+    timestamps = {}
+    time = None
+    for line in _git("log", "--format=%x00%ct", "--name-only", "--", folder).split("\n"):
+        if line.startswith("\0"):
+            time = int(line[1:])
+        elif line != "":
+            file = os.path.relpath(line, folder)
+            if file in timestamps:
+                # Commits are listed newest first
+                timestamps[file][0] = time
+            else:
+                timestamps[file] = [time, time]
+
+    if settings.use_cache:
+        os.makedirs(settings.cache_path, exist_ok=True)
+        with open(_timestamps_file(), "w") as f:
+            json.dump({"head": head, "folder": folder, "timestamps": timestamps}, f)
+    return timestamps
+
+
+def github_timestamps(filenames):
+    from github import Github
+
+    g = Github(settings.github_token)
+    repo = g.get_repo("mscroggs/defelement.com")
+    out = {}
+    for fname in filenames:
+        commits = repo.get_commits(path=f"elements/{fname}.def")
+        try:
+            out[fname] = (commits.get_page(-1)[-1].commit.committer.date,
+                          commits.get_page(0)[0].commit.committer.date)
+        except IndexError:
+            out[fname] = (datetime.now(timezone.utc), datetime.now(timezone.utc))
+    return out
+
+
+def element_timestamps(folder, filenames):
+    # Returns the created and modified times of each element, using the local git history if
+    # it is available and the GitHub API otherwise
+    timestamps = git_timestamps(folder)
+    if timestamps is not None:
+        out = {}
+        for fname in filenames:
+            if f"{fname}.def" in timestamps:
+                out[fname] = tuple(datetime.fromtimestamp(t, timezone.utc)
+                                   for t in timestamps[f"{fname}.def"])
+            else:
+                # Elements that have not been committed yet
+                out[fname] = (datetime.now(timezone.utc), datetime.now(timezone.utc))
+        return out
+
+    if settings.github_token is None:
+        warnings.warn("Git history not available and building without GitHub token. "
+                      "Timestamps will not be obtained.")
+        return {fname: (None, None) for fname in filenames}
+    return github_timestamps(filenames)
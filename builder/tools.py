@@ -1,5 +1,5 @@
-import yaml
 from . import settings
+from .catalogue import load_yaml
 from .markup import preprocess
 
 
@@ -7,7 +7,7 @@ def parse_metadata(content):
     metadata = {"title": None}
     if content.startswith("--\n"):
         metadata_in, content = content[3:].split("\n--\n", 1)
-        metadata.update(yaml.load(metadata_in, Loader=yaml.FullLoader))
+        metadata.update(load_yaml(metadata_in))
     content = preprocess(content.strip())
     if metadata["title"] is None and content.startswith("# "):
         metadata["title"] = content[2:].split("\n", 1)[0].strip()
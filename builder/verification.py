@@ -0,0 +1,258 @@
+import hashlib
+import json
+import os
+import traceback
+import numpy as np
+from importlib import metadata
+from . import settings
+
+# Tolerances used when comparing tables of basis functions. These are the defaults of np.allclose
+rtol = 1e-5
+atol = 1e-8
+
+
+def _columns(table):
+    # Each basis function as a row of a 2D array
+    table = np.asarray(table, dtype=float)
+    return np.ascontiguousarray(table.T).reshape(table.shape[-1], -1)
+
+
+def _close(a, b):
+    return np.all(np.abs(a - b) <= atol + rtol * np.abs(b), axis=-1)
+
+
+def _close_pairs(a, b, chunk_size=2 ** 20):
+    # Find the pairs (i, j) such that a[i] is close to b[j]. Each row is projected onto a fixed
+    # random direction: if two rows are close, their projections differ by at most width, so
+    # only rows whose projections are within width of each other need to be compared
+    w = np.random.default_rng(0).standard_normal(a.shape[1])
+    width = 2 * np.max((atol + rtol * np.abs(b)) @ np.abs(w))
+    pa = a @ w
+    pb = b @ w
+    order = np.argsort(pb, kind="stable")
+    lo = np.searchsorted(pb[order], pa - width, "left")
+    hi = np.searchsorted(pb[order], pa + width, "right")
+    counts = hi - lo
+
+    rows = np.repeat(np.arange(a.shape[0]), counts)
+    starts = np.repeat(lo - np.cumsum(counts) + counts, counts)
+    cols = order[starts + np.arange(len(rows))]
+
+    close = np.zeros(len(rows), dtype=bool)
+    step = max(1, chunk_size // max(1, a.shape[1]))
+    for i in range(0, len(rows), step):
+        close[i:i + step] = _close(a[rows[i:i + step]], b[cols[i:i + step]])
+    return rows[close], cols[close]
+
+
+def match_columns(table0, table1):
+    # Find a permutation p such that basis function i of table0 is close to basis function
+    # p[i] of table1. Returns the permutation, or None if there is no such permutation
+    if table0.shape != table1.shape:
+        return None
+    a = _columns(table0)
+    b = _columns(table1)
+    perm = np.arange(a.shape[0])
+
+    # The tables are often in the same order, so this is checked first
+    same = _close(a, b)
+    if np.all(same):
+        return perm
+
+    # The remaining basis functions are each matched to the first unused basis function of
+    # table1 that they are close to
+    remaining = np.flatnonzero(~same)
+    rows, cols = _close_pairs(a[remaining], b[remaining])
+    order = np.lexsort((cols, rows))
+    candidates = [[] for _ in remaining]
+    for i, j in zip(rows[order].tolist(), cols[order].tolist()):
+        candidates[i].append(j)
+    used = set()
+    for i, c in enumerate(candidates):
+        for j in c:
+            if j not in used:
+                used.add(j)
+                perm[remaining[i]] = remaining[j]
+                break
+        else:
+            return None
+    return perm
+
+
+def allclose_maybe_permuted(table0, table1):
+    # Returns whether the tables are equal up to a permutation of the basis functions, the
+    # permutation, and the largest difference between the tables after permuting
+    perm = match_columns(table0, table1)
+    if perm is None:
+        return False, None, None
+    table0 = np.asarray(table0, dtype=float)
+    table1 = np.asarray(table1, dtype=float)[..., perm]
+    return True, perm, float(np.max(np.abs(table0 - table1), initial=0.0))
+
+
+# The packages that each library used in verification is installed from
+packages = {
+    "symfem": ["symfem"],
+    "basix": ["fenics-basix"],
+    "basix.ufl": ["fenics-basix", "fenics-ufl"],
+    "fiat": ["fenics-fiat"],
+}
+
+
+def library_version(lib):
+    # The versions of the packages used by a library, including the commit if the package was
+    # installed from git. Returns None if the library is not installed
+    out = []
+    for package in packages[lib]:
+        try:
+            dist = metadata.distribution(package)
+        except metadata.PackageNotFoundError:
+            return None
+        version = dist.version
+        direct_url = dist.read_text("direct_url.json")
+        if direct_url is not None and "vcs_info" in json.loads(direct_url):
+            version += f" ({json.loads(direct_url)['vcs_info']['commit_id']})"
+        out.append(f"{package} {version}")
+    return ", ".join(out)
+
+
+# Changes to these files can change the result of verifying an element
+code_files = ["implementations.py", "verification.py"]
+_code_hash = None
+
+
+def code_hash():
+    global _code_hash
+    if _code_hash is None:
+        h = hashlib.sha256()
+        for i in code_files:
+            with open(os.path.join(settings.dir_path, "builder", i), "rb") as f:
+                h.update(f.read())
+        _code_hash = h.hexdigest()
+    return _code_hash
+
+
+def verification_inputs(definition, lib, versions):
+    # The inputs that a verification result depends on. A result only needs to be recomputed
+    # if these change
+    return {
+        "definition": definition, "versions": {"symfem": versions["symfem"], lib: versions[lib]},
+        "code": code_hash()}
+
+
+def verification_status(result):
+    # "pass" if the implementation is correct for every example it was checked on and none timed
+    # out, "partial" if some examples passed and others failed or timed out, "fail" if none
+    # passed, and "unverified" if no examples could be checked
+    if len(result["pass"]) == 0:
+        return "fail" if len(result["fail"]) > 0 else "unverified"
+    if len(result["fail"]) > 0 or len(result.get("timed out", [])) > 0:
+        return "partial"
+    return "pass"
+
+
+def badge_status(good, total):
+    # The status shown on a library's verification badge, from the number of examples that
+    # passed out of the number that passed or failed
+    if total == 0:
+        return "unverified"
+    if good / total < 0.4:
+        return "fail"
+    if good / total > 0.9:
+        return "pass"
+    return "partial"
+
+
+def is_up_to_date(result, inputs):
+    return all(i in result and result[i] == j for i, j in inputs.items())
+
+
+class TabulationCrashed(RuntimeError):
+    pass
+
+
+def tabulate(lib, fname, example):
+    from .implementations import verifications
+    from .snapshot import load_categoriser
+
+    e = load_categoriser(timestamps=False).get_element_by_filename(fname)
+    return verifications[lib](e, example)
+
+
+def _serve(connection, memory_limit):
+    if memory_limit is not None:
+        import resource
+        resource.setrlimit(resource.RLIMIT_AS, (memory_limit, memory_limit))
+    while True:
+        try:
+            target, args = connection.recv()
+        except EOFError:
+            break
+        try:
+            connection.send((True, target(*args)))
+        except BaseException as e:
+            try:
+                connection.send((False, e))
+            except BaseException:
+                connection.send((False, RuntimeError(traceback.format_exc())))
+
+
+class Supervisor:
+    # Runs functions in a separate worker process. If a function takes too long, or the worker
+    # crashes or runs out of memory, the worker is replaced by a new one
+    def __init__(self, memory_limit=None):
+        self.memory_limit = memory_limit
+        self.owner = os.getpid()
+        self.process = None
+        self.connection = None
+
+    def start(self):
+        import multiprocessing
+
+        self.connection, child = multiprocessing.Pipe()
+        self.process = multiprocessing.Process(
+            target=_serve, args=(child, self.memory_limit), daemon=True)
+        self.process.start()
+        child.close()
+
+    def stop(self):
+        if self.process is not None:
+            self.process.kill()
+            self.process.join()
+            self.connection.close()
+            self.process = None
+
+    def run(self, target, args, timeout=None):
+        if self.process is None or not self.process.is_alive():
+            self.start()
+        self.connection.send((target, args))
+        if not self.connection.poll(timeout):
+            self.stop()
+            raise TimeoutError(f"Did not finish in {timeout}s")
+        try:
+            success, value = self.connection.recv()
+        except EOFError:
+            self.process.join()
+            exitcode = self.process.exitcode
+            self.stop()
+            raise TabulationCrashed(f"Worker process exited with code {exitcode}")
+        if not success:
+            if isinstance(value, MemoryError):
+                self.stop()
+            raise value
+        return value
+
+
+_supervisor = None
+
+
+def run_tabulation(lib, fname, example):
+    # If a time or memory limit is set, the tabulation is run in a supervised worker process
+    global _supervisor
+    timeout = settings.verification_timeouts.get(lib, settings.verification_timeout)
+    if timeout is None and settings.verification_memory_limit is None:
+        return tabulate(lib, fname, example)
+    # Processes started by forking this one need their own worker
+    if _supervisor is None or _supervisor.owner != os.getpid():
+        _supervisor = Supervisor(settings.verification_memory_limit)
+    return _supervisor.run(tabulate, (lib, fname, example), timeout)
@@ -1,21 +1,16 @@
 import os
 import pytest
-import yaml
+from builder.catalogue import load_definition, load_definitions
 
 element_path = os.path.join(os.path.dirname(os.path.realpath(__file__)), "../elements")
 
-inputs = []
-for i in os.listdir(element_path):
-    if i.endswith(".def"):
-        with open(os.path.join(element_path, i)) as f:
-            data = yaml.load(f, Loader=yaml.FullLoader)
-        inputs += [(i, c) for c in data["reference-elements"]]
+inputs = [(f"{i}.def", c) for i, data in load_definitions(element_path).items()
+          for c in data["reference-elements"]]
 
 
 @pytest.mark.parametrize("file, cellname", inputs)
 def test_sequence(file, cellname):
-    with open(os.path.join(element_path, file)) as f:
-        data = yaml.load(f, Loader=yaml.FullLoader)
+    data = load_definition(os.path.join(element_path, file))
 
     if "mapping" not in data:
         pytest.skip()
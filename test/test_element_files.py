@@ -1,6 +1,8 @@
 import os
 import pytest
-import yaml
+from builder.catalogue import load_definition, load_definitions
+from builder import schema
+from builder.schema import schema_keys, validate_element
 
 dir_path = os.path.dirname(os.path.realpath(__file__))
 element_path = os.path.join(dir_path, "../elements")
@@ -25,8 +27,10 @@ def parse_contributing_page():
     return docs
 
 
+docs = parse_contributing_page()
+
+
 def test_parse():
-    docs = parse_contributing_page()
     assert len(docs["req"]) == len(set(docs["req"]))
     assert len(docs["opt"]) == len(set(docs["opt"]))
     assert len(docs["all"]) == len(set(docs["all"]))
@@ -35,13 +39,68 @@ def test_parse():
 
 @pytest.mark.parametrize("e", [e for e in os.listdir(element_path) if e.endswith(".def")])
 def test_element_page(e):
-    with open(os.path.join(element_path, e)) as f:
-        data = yaml.load(f, Loader=yaml.FullLoader)
-
-    docs = parse_contributing_page()
+    data = load_definition(os.path.join(element_path, e))
 
     for key in data.keys():
         assert key in docs["all"]
 
     for key in docs["req"]:
         assert key in data
+
+
+def test_schema_keys():
+    assert set(schema_keys["required"]) == set(docs["req"])
+    assert set(schema_keys["required"] + schema_keys["optional"]) == set(docs["all"])
+
+
+filenames = list(load_definitions(element_path))
+
+
+@pytest.mark.parametrize("e", filenames)
+def test_element_schema(e):
+    errors = validate_element(e, load_definition(os.path.join(element_path, f"{e}.def")),
+                              filenames)
+    assert len(errors) == 0, "\n".join(errors)
+
+
+valid = {"name": "Lagrange", "html-name": "Lagrange", "reference-elements": ["triangle"]}
+
+
+@pytest.mark.parametrize("data, error", [
+    ({"name": "Lagrange", "reference-elements": ["triangle"]},
+     "lagrange.def: missing key 'html-name'"),
+    ({**valid, "name": 1}, "lagrange.def: name: expected str, got int"),
+    ({**valid, "reference-elements": "triangle"},
+     "lagrange.def: reference-elements: expected list, got str"),
+    ({**valid, "min-order": True}, "lagrange.def: min-order: expected int, got bool"),
+    ({**valid, "ndofs": {"triangle": {"formula": "k+"}}},
+     "lagrange.def: ndofs.triangle.formula: "),
+    ({**valid, "degree": 1}, "lagrange.def: unknown key 'degree'"),
+    ({**valid, "reference-elements": ["triangel"]},
+     "lagrange.def: reference-elements[0]: unknown value 'triangel'"),
+    ({**valid, "mixed": ["vector-lagrange(1)"]},
+     "lagrange.def: mixed[0]: unknown element 'vector-lagrange'"),
+])
+def test_invalid_element(data, error):
+    errors = validate_element("lagrange", data)
+    assert len(errors) == 1
+    assert errors[0].startswith(error)
+
+
+def test_valid_element():
+    assert validate_element("lagrange", valid) == []
+
+
+def test_check_catalogue(monkeypatch):
+    monkeypatch.setattr(schema, "load_definitions", lambda folder: {
+        "lagrange": valid, "bad": {**valid, "name": 1, "degree": 1}, "worse": {"name": "Worse"}})
+    assert len(schema.validate_catalogue()) == 4
+    with pytest.raises(ValueError) as e:
+        schema.check_catalogue()
+    assert str(e.value).split("\n") == [
+        "4 error(s) found in element definitions:",
+        "bad.def: name: expected str, got int",
+        "bad.def: unknown key 'degree'",
+        "worse.def: missing key 'html-name'",
+        "worse.def: missing key 'reference-elements'",
+    ]
@@ -0,0 +1,66 @@
+import numpy as np
+import pytest
+from builder.formulas import FormulaError, compile_formula, dof_count_table
+
+orders = np.arange(6)
+
+
+@pytest.mark.parametrize("formula, values", [
+    ("(k+1)(k+2)/2", [1, 3, 6, 10, 15, 21]),
+    ("3k^2", [0, 3, 12, 27, 48, 75]),
+    ("2(k+1)", [2, 4, 6, 8, 10, 12]),
+    ("(k+1)^2(k+2)", [2, 12, 36, 80, 150, 252]),
+    ("k/2", [0, 0, 1, 1, 2, 2]),
+    ("(k+1)(k+2)(k+3)/6", [1, 4, 10, 20, 35, 56]),
+    ("2^k", [1, 2, 4, 8, 16, 32]),
+    ("-k+5", [5, 4, 3, 2, 1, 0]),
+    ("k - 1", [-1, 0, 1, 2, 3, 4]),
+    (" 3 ", [3, 3, 3, 3, 3, 3]),
+    (4, [4, 4, 4, 4, 4, 4]),
+])
+def test_formula(formula, values):
+    f = compile_formula(formula)
+    assert f(orders).tolist() == values
+    assert not f(orders).mask.any()
+    assert all(f.defined(orders))
+
+
+def test_formula_with_n():
+    f = compile_formula("(k+1)^n")
+    assert f.variables == {"k", "n"}
+    assert f(orders, 2).tolist() == [1, 4, 9, 16, 25, 36]
+    with pytest.raises(FormulaError):
+        f(orders)
+
+
+@pytest.mark.parametrize("formula, values", [
+    ([{"k=1": 4}, {"k>1": "k(k+3)/2+3"}], [None, 4, 8, 12, 17, 23]),
+    ([{"k=0,2": 1}, {"k>=3": "k"}], [1, None, 1, 3, 4, 5]),
+    ([{"k<2": "k+1"}, {"k<=3": 10}, {"k>4": "k"}], [1, 2, 10, 10, None, 5]),
+    ([{"k>=1": 1}, {"k>=2": 2}], [None, 1, 1, 1, 1, 1]),
+    ([{"k=0": "k-1"}, {"k>1": "k"}], [-1, None, 2, 3, 4, 5]),
+])
+def test_piecewise_formula(formula, values):
+    f = compile_formula(formula)
+    assert f(orders).tolist() == values
+    assert list(f.defined(orders)) == [v is not None for v in values]
+
+
+def test_dof_count_table():
+    ndofs = {
+        "triangle": {"formula": [{"k=1": 3}, {"k>1": "(k+1)(k+2)/2"}]},
+        "interval": {"formula": "k+1"},
+        "simplex": {"formula": "k+n"},
+        "point": {"formula": [{"k=0": "k-1"}, {"k>1": 1}]},
+    }
+    assert dof_count_table(ndofs, [0, 1, 2]) == {
+        "triangle": {1: 3, 2: 6}, "interval": {0: 1, 1: 2, 2: 3}, "point": {0: -1, 2: 1}}
+
+
+@pytest.mark.parametrize("formula", [
+    "k+", "(k+1", "k+1)", "k$2", "k**2", "2 k x", "", 1.5, True, None,
+    [{"k=1": 4, "k>1": 5}], [{"k!=1": 4}], [{"n>1": 4}], [4], [{"k>1": "k+"}],
+])
+def test_malformed_formula(formula):
+    with pytest.raises(FormulaError):
+        compile_formula(formula)
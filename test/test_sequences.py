@@ -1,11 +1,15 @@
+import numpy as np
 import os
 import pytest
-import re
 import signal
 import symfem
 import urllib.request
-import yaml
 import warnings
+from builder import settings
+from builder.catalogue import load_definition, load_definitions
+from builder.element import Element
+from builder.formulas import compile_formula
+from builder.implementations import VariantNotImplemented
 
 
 class TimeOutTheTest(BaseException):
@@ -16,38 +20,15 @@ def handler(signum, frame):
     raise TimeOutTheTest()
 
 
-def latex_to_pyth(formula):
-    formula = re.sub(r"([0-9])\(", r"\1*(", str(formula))
-    formula = re.sub(r"([0-9])k", r"\1*k", str(formula))
-    formula = formula.replace(")(", ")*(")
-    formula = formula.replace("k(", "k*(")
-    formula = formula.replace("^", "**")
-    formula = formula.replace("/", "//")
-    return formula
-
-
 def check_formula(formula, seq):
-    if isinstance(formula, list):
-        parts = []
-        for i, fpart in enumerate(formula):
-            k, j = list(fpart.items())[0]
-            if "=" in k:
-                ns = [int(a) for a in k.split("=")[1].split(",")]
-            elif ">=" in k:
-                ns = [a for a in seq if a >= int(k.split(">=")[1])]
-            elif ">" in k:
-                ns = [a for a in seq if a > int(k.split(">")[1])]
-            parts.append((j, ns))
-        for k, s in seq.items():
-            for i, j in parts:
-                if k in j:
-                    assert s == eval(latex_to_pyth(i).replace("k", str(k)))
-                    break
-            else:
-                warnings.warn(f"k={k} is not included in this sequence")
-    else:
-        for k, s in seq.items():
-            assert s == eval(latex_to_pyth(formula).replace("k", str(k)))
+    f = compile_formula(formula)
+    orders = np.array(list(seq), dtype=int)
+    values = f(orders)
+    for k, s, value, masked in zip(orders, seq.values(), values.data, values.mask):
+        if masked:
+            warnings.warn(f"k={k} is not included in this sequence")
+        else:
+            assert s == value
 
 
 def is_satisfied(condition, n):
@@ -68,31 +49,90 @@ def check_oeis(oeis, seq):
         condition = condition.split("]")[0]
         seq = {i: j for i, j in seq.items() if is_satisfied(condition, i)}
     seq = {i: j for i, j in seq.items() if j > 0}
-    with urllib.request.urlopen(f"http://oeis.org/{oeis}/list") as f:
-        oeis_seq = "".join([
-            i.strip() for i in f.read().decode('utf-8').split(
-                "<pre>[")[1].split("]</pre>")[0].split("\n")])
+    oeis_seq = oeis_sequence(oeis)
+    if oeis_seq is None:
+        warnings.warn(f"{oeis} could not be downloaded from OEIS, so it was not checked")
+        return
     assert ",".join([str(i) for i in seq.values()]) in oeis_seq
 
 
-element_path = os.path.join(os.path.dirname(os.path.realpath(__file__)), "../elements")
+def oeis_sequence(oeis):
+    # Sequences are downloaded from OEIS once and kept in the cache folder, so that the tests
+    # can be run offline once they have been run online. Returns None if the sequence is not
+    # in the cache and cannot be downloaded
+    path = os.path.join(settings.cache_path, "oeis", f"{oeis}.txt")
+    if not os.path.isfile(path):
+        try:
+            with urllib.request.urlopen(f"http://oeis.org/{oeis}/list", timeout=30) as f:
+                page = f.read().decode('utf-8')
+        except OSError:
+            return None
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "w") as f:
+            f.write("".join([
+                i.strip() for i in page.split("<pre>[")[1].split("]</pre>")[0].split("\n")]))
+    with open(path) as f:
+        return f.read()
+
+
+def symfem_implementation(file, data, cellname):
+    # The name and parameters used to create the element in symfem. The variants of an element
+    # have the same number of DOFs, so the first variant that symfem implements is used
+    e = Element(data, file[:-4])
+    if not e.implemented("symfem"):
+        return None, {}
+    variants = list(data["variants"]) if "variants" in data else [None]
+    for variant in variants:
+        try:
+            return e.get_implementation_string("symfem", cellname, variant)
+        except VariantNotImplemented:
+            pass
+    return None, {}
 
-inputs = []
-for i in os.listdir(element_path):
-    if i.endswith(".def"):
-        with open(os.path.join(element_path, i)) as f:
-            data = yaml.load(f, Loader=yaml.FullLoader)
-        inputs += [(i, c) for c in data["reference-elements"]]
 
+element_path = os.path.join(os.path.dirname(os.path.realpath(__file__)), "../elements")
 
-@pytest.mark.parametrize("file, cellname", inputs)
+inputs = [(f"{i}.def", c) for i, data in load_definitions(element_path).items()
+          for c in data["reference-elements"]]
+
+# Elements where the number of DOFs of the symfem element does not match the formula in the
+# catalogue. For most of these, symfem numbers the orders of the element differently
+order_minus_one = "symfem's element of order k-1 has the number of DOFs given for order k"
+order_plus_one = "symfem's element of order k+1 has the number of DOFs given for order k"
+known_mismatches = {
+    ("arnold-winther.def", "triangle"): order_minus_one,
+    ("brezzi-douglas-fortin-marini.def", "triangle"): "symfem's element has more DOFs",
+    ("brezzi-douglas-fortin-marini.def", "quadrilateral"): order_minus_one,
+    ("brezzi-douglas-fortin-marini.def", "tetrahedron"): "symfem's element has more DOFs",
+    ("brezzi-douglas-fortin-marini.def", "hexahedron"): order_minus_one,
+    ("guzman-neilan.def", "triangle"): "symfem's element has fewer DOFs",
+    ("guzman-neilan.def", "tetrahedron"): "symfem's element has fewer DOFs",
+    ("huang-zhang.def", "quadrilateral"): order_minus_one,
+    ("nedelec1.def", "triangle"): order_minus_one,
+    ("nedelec1.def", "tetrahedron"): order_minus_one,
+    ("nedelec1.def", "quadrilateral"): order_minus_one,
+    ("nedelec1.def", "hexahedron"): order_minus_one,
+    ("nedelec1.def", "prism"): order_minus_one,
+    ("qdiv.def", "quadrilateral"): order_minus_one,
+    ("qdiv.def", "hexahedron"): order_minus_one,
+    ("raviart-thomas.def", "triangle"): order_minus_one,
+    ("raviart-thomas.def", "tetrahedron"): order_minus_one,
+    ("tnt.def", "quadrilateral"): order_plus_one,
+    ("tnt.def", "hexahedron"): order_plus_one,
+}
+sequence_inputs = [
+    pytest.param(*i, marks=pytest.mark.xfail(reason=known_mismatches[i]))
+    if i in known_mismatches else i for i in inputs]
+
+
+@pytest.mark.parametrize("file, cellname", sequence_inputs)
 def test_sequence(file, cellname):
     if cellname == "dual polygon":
         pytest.skip()
-    with open(os.path.join(element_path, file)) as f:
-        data = yaml.load(f, Loader=yaml.FullLoader)
+    data = load_definition(os.path.join(element_path, file))
 
-    if "symfem" not in data:
+    symfem_name, params = symfem_implementation(file, data, cellname)
+    if symfem_name is None:
         pytest.skip()
     if "ndofs" not in data:
         pytest.skip()
@@ -112,22 +152,11 @@ def test_sequence(file, cellname):
         else:
             maxk = min(maxk, data["max-order"])
 
-    if isinstance(data["symfem"], dict):
-        if cellname not in data["symfem"]:
-            pytest.skip()
-        symfem_name = data["symfem"][cellname]
-    else:
-        symfem_name = data["symfem"]
-
     for k in range(mink, maxk + 1):
         try:
             signal.signal(signal.SIGALRM, handler)
             signal.alarm(25)
-            if "variant=" in symfem_name:
-                elementname, variant = symfem_name.split(" variant=")
-                term = symfem.create_element(cellname, elementname, k, variant=variant).space_dim
-            else:
-                term = symfem.create_element(cellname, symfem_name, k).space_dim
+            term = symfem.create_element(cellname, symfem_name, k, **params).space_dim
             seq[k] = term
         except NotImplementedError:
             pass
@@ -149,10 +178,10 @@ def test_sequence(file, cellname):
 def test_entity_sequences(file, cellname):
     if cellname == "dual polygon":
         pytest.skip()
-    with open(os.path.join(element_path, file)) as f:
-        data = yaml.load(f, Loader=yaml.FullLoader)
+    data = load_definition(os.path.join(element_path, file))
 
-    if "symfem" not in data:
+    symfem_name, params = symfem_implementation(file, data, cellname)
+    if symfem_name is None:
         pytest.skip()
     if "entity-ndofs" not in data:
         pytest.skip()
@@ -173,22 +202,11 @@ def test_entity_sequences(file, cellname):
         else:
             maxk = min(maxk, data["max-order"])
 
-    if isinstance(data["symfem"], dict):
-        if cellname not in data["symfem"]:
-            pytest.skip()
-        symfem_name = data["symfem"][cellname]
-    else:
-        symfem_name = data["symfem"]
-
     for k in range(mink, maxk + 1):
         try:
             signal.signal(signal.SIGALRM, handler)
             signal.alarm(25)
-            if "variant=" in symfem_name:
-                elementname, variant = symfem_name.split(" variant=")
-                e = symfem.create_element(cellname, elementname, k, variant=variant)
-            else:
-                e = symfem.create_element(cellname, symfem_name, k)
+            e = symfem.create_element(cellname, symfem_name, k, **params)
             for d, e_name in zip(range(e.reference.tdim),
                                  ["vertices", "edges", "faces", "volumes"]):
                 seq[e_name][k] = len(e.entity_dofs(d, 0))
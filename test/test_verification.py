@@ -0,0 +1,58 @@
+import numpy as np
+import pytest
+from builder.verification import allclose_maybe_permuted, badge_status, verification_status
+
+rng = np.random.default_rng(0)
+
+
+@pytest.mark.parametrize("npoints, range_dim, ndofs", [(10, 1, 1), (20, 1, 6), (84, 3, 30)])
+def test_permuted(npoints, range_dim, ndofs):
+    table = rng.standard_normal((npoints, range_dim, ndofs))
+    perm = rng.permutation(ndofs)
+    same, found, error = allclose_maybe_permuted(table, table[..., perm])
+    assert same
+    assert np.allclose(table, table[..., perm][..., found])
+    assert error == 0.0
+
+
+def test_repeated_basis_functions():
+    table = rng.standard_normal((10, 2, 3))[..., [0, 1, 1, 2, 0]]
+    same, found, _ = allclose_maybe_permuted(table, table[..., ::-1])
+    assert same
+    assert sorted(found) == list(range(5))
+
+
+def test_within_tolerance():
+    table = rng.standard_normal((10, 1, 4))
+    same, found, error = allclose_maybe_permuted(table + 1e-9, table[..., [1, 0, 3, 2]])
+    assert same
+    assert list(found) == [1, 0, 3, 2]
+    assert error < 1e-8
+
+
+def test_not_permuted():
+    table = rng.standard_normal((10, 1, 4))
+    other = table[..., [3, 2, 1, 0]].copy()
+    other[0, 0, 1] += 1e-3
+    assert not allclose_maybe_permuted(table, other)[0]
+    assert not allclose_maybe_permuted(table, table[..., [0, 1, 1, 2]])[0]
+    assert not allclose_maybe_permuted(table, table[..., :3])[0]
+
+
+@pytest.mark.parametrize("result, status", [
+    ({"pass": ["a", "b"], "fail": [], "not implemented": ["c"], "timed out": []}, "pass"),
+    ({"pass": ["a"], "fail": ["b"], "not implemented": [], "timed out": []}, "partial"),
+    ({"pass": ["a"], "fail": [], "not implemented": [], "timed out": ["b"]}, "partial"),
+    ({"pass": [], "fail": ["a"], "not implemented": [], "timed out": ["b"]}, "fail"),
+    ({"pass": [], "fail": [], "not implemented": ["a"], "timed out": ["b"]}, "unverified"),
+    ({"pass": [], "fail": [], "not implemented": ["a"]}, "unverified"),
+])
+def test_verification_status(result, status):
+    assert verification_status(result) == status
+
+
+@pytest.mark.parametrize("good, total, status", [
+    (10, 10, "pass"), (5, 10, "partial"), (1, 10, "fail"), (0, 10, "fail"), (0, 0, "unverified"),
+])
+def test_badge_status(good, total, status):
+    assert badge_status(good, total) == status
@@ -1,11 +1,16 @@
-import os
 import json
+import os
 import argparse
-import numpy as np
 from datetime import datetime
 from builder import settings
-from builder.element import Categoriser
-from builder.implementations import verifications
+from builder.catalogue import definition_hash
+from builder.implementations import parse_example, verifications
+from builder.scheduler import TasksFailed, heuristic_cost, run_tasks
+from builder.schema import check_catalogue
+from builder.snapshot import load_categoriser
+from builder.verification import (
+    TabulationCrashed, allclose_maybe_permuted, is_up_to_date, library_version, run_tabulation,
+    verification_inputs)
 
 start_all = datetime.now()
 
@@ -16,12 +21,35 @@ parser.add_argument('--test', metavar="test", default=None,
                     help="Verify fewer elements.")
 parser.add_argument('--processes', metavar="processes", default=None,
                     help="The number of processes to run the verification on.")
+parser.add_argument('--load-processes', metavar="load_processes", default=None,
+                    help="The number of processes used to parse changed .def files.")
+parser.add_argument('--incremental', action="store_true",
+                    help="Only verify elements and libraries that have changed since the last run.")
+parser.add_argument('--timeout', metavar="timeout", default=None,
+                    help="The number of seconds each tabulation can take before it is stopped.")
+parser.add_argument('--library-timeout', metavar="library_timeout", action="append", default=[],
+                    help="The timeout for one library, eg symfem=1200.")
+parser.add_argument('--memory-limit', metavar="memory_limit", default=None,
+                    help="The number of MB of memory each tabulation can use.")
+parser.add_argument('--no-cache', action="store_true",
+                    help="Do not use the on-disk cache of symfem elements.")
 
 args = parser.parse_args()
 if args.destination is not None:
     settings.verification_json = args.destination
 if args.processes is not None:
     settings.processes = int(args.processes)
+if args.load_processes is not None:
+    settings.load_processes = int(args.load_processes)
+if args.timeout is not None:
+    settings.verification_timeout = float(args.timeout)
+for i in args.library_timeout:
+    lib, timeout = i.split("=")
+    settings.verification_timeouts[lib] = float(timeout)
+if args.memory_limit is not None:
+    settings.verification_memory_limit = int(args.memory_limit) * 1024 ** 2
+if args.no_cache:
+    settings.use_cache = False
 if args.test is None:
     test_elements = None
 elif args.test == "auto":
@@ -32,112 +60,124 @@ elif args.test == "auto":
 else:
     test_elements = args.test.split(",")
 
-categoriser = Categoriser()
-categoriser.load_references(os.path.join(settings.data_path, "references"))
-categoriser.load_families(os.path.join(settings.data_path, "families"))
+# Check the element definitions before starting the verification
+check_catalogue()
 
 # Load elements from .def files
-categoriser.load_folder(settings.element_path)
+categoriser = load_categoriser(timestamps=False)
+
+versions = {i: library_version(i) for i in verifications}
+old_data = {}
+if args.incremental and os.path.isfile(settings.verification_json):
+    with open(settings.verification_json) as f:
+        old_data = json.load(f)
 
+definitions = {}
 elements_to_verify = []
 for e in categoriser.elements:
     if test_elements is None or e.filename in test_elements:
-        for eg in e.examples:
-            implementations = [i for i in verifications if i != "symfem" and e.implemented(i)]
-            if len(implementations) > 0:
-                elements_to_verify.append((e, eg, implementations))
-
-
-def allclose_maybe_permuted(table0, table1):
-    remaining = [i for i, _ in enumerate(table1.T)]
-    for t0 in table0.T:
-        for i in remaining:
-            if np.allclose(t0, table1.T[i]):
-                remaining.remove(i)
-                break
-        else:
-            return False
-    return True
-
-
-def verify(egs, process="", result_dict=None):
+        definitions[e.filename] = definition_hash(
+            os.path.join(settings.element_path, f"{e.filename}.def"))
+        implementations = [i for i in verifications if i != "symfem" and e.implemented(i)]
+        if args.incremental:
+            # Results are reused if the element and the libraries have not changed since they
+            # were computed, or if the library is not installed
+            old = old_data[e.filename] if e.filename in old_data else {}
+            implementations = [
+                i for i in implementations if versions[i] is not None and (
+                    i not in old or not is_up_to_date(
+                        old[i], verification_inputs(definitions[e.filename], i, versions)))]
+        if len(implementations) > 0:
+            for eg in e.examples:
+                elements_to_verify.append((e.filename, eg, implementations))
+if args.incremental:
+    print(f"Verifying {len(elements_to_verify)} examples with changed inputs")
+
+
+def verify(task, process=""):
     green = "\033[32m"
     red = "\033[31m"
     blue = "\033[34m"
+    yellow = "\033[33m"
     default = "\033[0m"
 
+    # Elements are passed by filename and looked up in the catalogue snapshot by the process
+    # that tabulates them, so that Element objects do not need to be sent to each process
+    fname, eg, implementations = task
+
     results = {}
-    for e, eg, implementations in egs:
-        tables = {}
-        for i in implementations:
-            try:
-                tables[i] = verifications[i](e, eg)
-            except ImportError:
-                print(f"{process}{i} not installed")
-            except NotImplementedError:
-                if e.filename not in results:
-                    results[e.filename] = {}
-                if i not in results[e.filename]:
-                    results[e.filename][i] = {"pass": [], "fail": [], "not implemented": []}
-                results[e.filename][i]["not implemented"].append(eg)
-                print(f"{process}{e.filename} {i} {eg} {blue}\u2013{default}")
-        if len(tables) > 0:
-            sym_table = verifications["symfem"](e, eg)
-            for i, t in tables.items():
-                if e.filename not in results:
-                    results[e.filename] = {}
-                if i not in results[e.filename]:
-                    results[e.filename][i] = {"pass": [], "fail": [], "not implemented": []}
-                if sym_table.shape == t.shape and allclose_maybe_permuted(sym_table, t):
-                    results[e.filename][i]["pass"].append(eg)
-                    print(f"{process}{e.filename} {i} {eg} {green}\u2713{default}")
-                else:
-                    results[e.filename][i]["fail"].append(eg)
-                    print(f"{process}{e.filename} {i} {eg} {red}\u2715{default}")
-    if result_dict is not None:
-        result_dict[process] = results
+    tables = {}
+    for i in implementations:
+        try:
+            tables[i] = run_tabulation(i, fname, eg)
+        except ImportError:
+            print(f"{process}{i} not installed")
+        except NotImplementedError:
+            results[i] = "not implemented"
+            print(f"{process}{fname} {i} {eg} {blue}\u2013{default}")
+        except (TimeoutError, MemoryError):
+            results[i] = "timed out"
+            print(f"{process}{fname} {i} {eg} {yellow}timed out{default}")
+        except TabulationCrashed as e:
+            results[i] = "fail"
+            print(f"{process}{fname} {i} {eg} {red}\u2715 ({e}){default}")
+    if len(tables) > 0:
+        try:
+            sym_table = run_tabulation("symfem", fname, eg)
+        except (TimeoutError, MemoryError):
+            sym_table = None
+            print(f"{process}{fname} symfem {eg} {yellow}timed out{default}")
+        for i, t in tables.items():
+            if sym_table is None:
+                results[i] = "timed out"
+            elif allclose_maybe_permuted(sym_table, t)[0]:
+                results[i] = "pass"
+                print(f"{process}{fname} {i} {eg} {green}\u2713{default}")
+            else:
+                results[i] = "fail"
+                print(f"{process}{fname} {i} {eg} {red}\u2715{default}")
     return results
 
 
-if settings.processes == 1:
-    data = verify(elements_to_verify)
-else:
-    import multiprocessing
-
-    p = settings.processes
-    n_egs = len(elements_to_verify)
-
-    jobs = []
-    manager = multiprocessing.Manager()
-    results = manager.dict()
-    for i in range(p):
-        process = multiprocessing.Process(
-            target=verify,
-            args=(elements_to_verify[n_egs * i // p: n_egs * (i + 1) // p], f"[{i}] ", results)
-        )
-        jobs.append(process)
-
-    for j in jobs:
-        j.start()
-
-    for j in jobs:
-        j.join()
-
-    for j in jobs:
-        assert j.exitcode == 0
-
-    data = {}
-    for r in results.values():
-        for i0, j0 in r.items():
-            if i0 not in data:
-                data[i0] = {}
-            for i1, j1 in j0.items():
-                if i1 not in data[i0]:
-                    data[i0][i1] = {}
-                for i2, j2 in j1.items():
-                    if i2 not in data[i0][i1]:
-                        data[i0][i1][i2] = []
-                    data[i0][i1][i2] += j2
+# Each example is verified against every library as one task, so that the symfem table is only
+# computed once. Tasks are handed to the worker processes one at a time, longest first
+failed = None
+try:
+    results = run_tasks(
+        "verification", verify, elements_to_verify,
+        [f"{fname} {eg}" for fname, eg, _ in elements_to_verify],
+        [heuristic_cost(*parse_example(eg)[:2]) for _, eg, _ in elements_to_verify])
+except TasksFailed as e:
+    # The results that were computed are still saved. Elements with an example that was not
+    # verified keep their old results, so that they are verified again by the next run
+    failed = e
+    results = e.results
+incomplete = set(fname for (fname, _, _), result in zip(elements_to_verify, results)
+                 if result is None)
+
+data = {}
+for fname, results_for_element in old_data.items():
+    # Keep the results for elements that are still in the catalogue and libraries that they
+    # are still implemented in
+    if fname in [e.filename for e in categoriser.elements]:
+        e = categoriser.get_element_by_filename(fname)
+        data[fname] = {i: j for i, j in results_for_element.items() if e.implemented(i)}
+
+updated = []
+for (fname, eg, _), result in zip(elements_to_verify, results):
+    if fname in incomplete:
+        continue
+    for i, outcome in result.items():
+        if fname not in data:
+            data[fname] = {}
+        if (fname, i) not in updated:
+            data[fname][i] = {"pass": [], "fail": [], "not implemented": [], "timed out": [],
+                              **verification_inputs(definitions[fname], i, versions)}
+            updated.append((fname, i))
+        data[fname][i][outcome].append(eg)
 
 with open(settings.verification_json, "w") as f:
     json.dump(data, f)
+
+if failed is not None:
+    raise failed